@@ -1,6 +1,5 @@
 import streamlit as st
 import hashlib
-from database import Database
 from styles import apply_custom_styles
 
 def login():
@@ -17,6 +16,8 @@ def login():
             password = st.text_input("Password", type="password", key="login_password")
 
             if st.button("Login", key="login_button"):
+                # Deferred so the login screen renders without loading pandas/psycopg2
+                from database import Database
                 db = Database()
                 try:
                     password_hash = hashlib.sha256(password.encode()).hexdigest()
@@ -40,6 +41,7 @@ def login():
                 elif len(new_password) < 6:
                     st.error("Password must be at least 6 characters long")
                 else:
+                    from database import Database
                     db = Database()
                     try:
                         # Check if username exists
@@ -0,0 +1,340 @@
+"""Benchmark suite for the data and rendering paths.
+
+Runs each case at several data sizes and records throughput, latency
+percentiles and peak memory to JSON, so results can be compared between
+releases.
+
+Usage:
+    python benchmarks.py                                  # 1k/100k/1M rows
+    python benchmarks.py --sizes 1000 10000 --only fallback export
+    python benchmarks.py --output bench.json --compare baseline.json
+
+The Postgres cases use the PG* environment variables and run inside a
+throwaway `bench` schema that is dropped afterwards; they are skipped if no
+server is reachable. Cases that are impractical at large sizes (folium maps,
+Excel exports, per-row fallback inserts) have a size cap that --no-caps lifts.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+import data_generator
+from database import Database
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def measure(func, rows_per_call, repeat, warmup=1, track_memory=True):
+    """Time `repeat` calls of func and measure peak memory of one more call"""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    peak_mb = None
+    if track_memory:
+        # Separate run: tracemalloc slows allocation-heavy code noticeably
+        tracemalloc.start()
+        try:
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+
+    mean = sum(latencies) / len(latencies)
+    return {
+        'repeat': repeat,
+        'mean_ms': mean * 1000,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'min_ms': latencies[0] * 1000,
+        'max_ms': latencies[-1] * 1000,
+        'rows_per_s': rows_per_call / mean if mean > 0 else None,
+        'peak_mem_mb': peak_mb
+    }
+
+def aircraft_records(frame):
+    return frame.to_dict('records')
+
+# Each case is (name, group, max_size, repeat, setup). setup(size, ctx) returns
+# (callable, rows_per_call, teardown-or-None).
+
+def setup_generate_aircraft(size, ctx):
+    return (lambda: data_generator.generate_aircraft_data(size)), size, None
+
+def setup_generate_inventory(size, ctx):
+    return (lambda: data_generator.generate_inventory_data(size)), size, None
+
+def setup_generate_comm_logs(size, ctx):
+    return (lambda: data_generator.generate_comm_logs(size)), size, None
+
+def _fallback_db(size, ctx):
+    data_dir = tempfile.mkdtemp(prefix='aero_bench_')
+    db = Database(fallback_only=True, data_dir=data_dir)
+    frame = ctx.aircraft(size)
+    db._write_fallback_table('aircraft', {r['aircraft_id']: r for r in aircraft_records(frame)})
+
+    def teardown():
+        db.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return db, teardown
+
+def setup_fallback_read(size, ctx):
+    db, teardown = _fallback_db(size, ctx)
+    return db.get_all_aircraft, size, teardown
+
+def setup_fallback_insert(size, ctx):
+    # Latency of a single upsert against a table already holding `size` rows
+    db, teardown = _fallback_db(size, ctx)
+    record = aircraft_records(ctx.aircraft(1))[0]
+    return (lambda: db.insert_aircraft(dict(record))), 1, teardown
+
+def _postgres_db(size, ctx):
+    if not ctx.postgres_available():
+        return None, None
+    from psycopg2.extras import execute_values
+
+    # Replicas don't see the session's search_path, so read from the primary
+    db = Database(use_replicas=False)
+    db._execute('bench_schema', "CREATE SCHEMA IF NOT EXISTS bench")
+    db._execute('bench_schema', "SET search_path TO bench")
+    db.create_tables()
+    db._execute('bench_truncate', "TRUNCATE aircraft")
+    frame = ctx.aircraft(size)
+    execute_values(
+        db.cursor,
+        "INSERT INTO aircraft (aircraft_id, type, latitude, longitude, altitude, speed, heading) VALUES %s",
+        list(frame[['aircraft_id', 'type', 'latitude', 'longitude', 'altitude', 'speed', 'heading']]
+             .itertuples(index=False, name=None)),
+        page_size=10000
+    )
+    db.connection.commit()
+
+    def teardown():
+        db._execute('bench_schema', "DROP SCHEMA bench CASCADE")
+        db.connection.commit()
+        db.close()
+    return db, teardown
+
+def setup_postgres_read(size, ctx):
+    db, teardown = _postgres_db(size, ctx)
+    if db is None:
+        return None
+    return db.get_all_aircraft, size, teardown
+
+def setup_postgres_insert(size, ctx):
+    db, teardown = _postgres_db(size, ctx)
+    if db is None:
+        return None
+    record = aircraft_records(ctx.aircraft(1))[0]
+    return (lambda: db.insert_aircraft(dict(record))), 1, teardown
+
+def setup_map_build(size, ctx):
+    # Importing main configures the Streamlit page; outside `streamlit run`
+    # that is a harmless no-op.
+    from main import build_aircraft_map
+    frame = ctx.aircraft(size)
+    return (lambda: build_aircraft_map(frame)), size, None
+
+def setup_viz_scatter(size, ctx):
+    from dashboard_viz import create_aircraft_scatter
+    frame = ctx.aircraft(size)
+    return (lambda: create_aircraft_scatter(frame)), size, None
+
+def setup_viz_treemap(size, ctx):
+    from dashboard_viz import create_inventory_treemap
+    frame = ctx.inventory(size)
+    return (lambda: create_inventory_treemap(frame)), size, None
+
+def setup_viz_timeline(size, ctx):
+    from dashboard_viz import create_communications_timeline
+    frame = ctx.comm_logs(size)
+    return (lambda: create_communications_timeline(frame)), size, None
+
+def setup_export_csv(size, ctx):
+    from export_utils import export_to_csv
+    frame = ctx.aircraft(size)
+    return (lambda: export_to_csv(frame, 'bench')), size, None
+
+def setup_export_excel(size, ctx):
+    from export_utils import export_to_excel
+    frame = ctx.aircraft(size)
+    return (lambda: export_to_excel(frame, 'bench')), size, None
+
+CASES = [
+    ('generate.aircraft', 'generate', None, 5, setup_generate_aircraft),
+    ('generate.inventory', 'generate', None, 5, setup_generate_inventory),
+    ('generate.comm_logs', 'generate', None, 5, setup_generate_comm_logs),
+    ('fallback.read_aircraft', 'fallback', None, 5, setup_fallback_read),
+    ('fallback.insert_aircraft', 'fallback', 100000, 20, setup_fallback_insert),
+    ('postgres.read_aircraft', 'postgres', None, 5, setup_postgres_read),
+    ('postgres.insert_aircraft', 'postgres', None, 200, setup_postgres_insert),
+    ('map.build', 'map', 10000, 3, setup_map_build),
+    ('viz.aircraft_scatter', 'viz', None, 3, setup_viz_scatter),
+    ('viz.inventory_treemap', 'viz', None, 3, setup_viz_treemap),
+    ('viz.communications_timeline', 'viz', None, 3, setup_viz_timeline),
+    ('export.csv', 'export', None, 3, setup_export_csv),
+    ('export.excel', 'export', 100000, 1, setup_export_excel),
+]
+
+class Context:
+    """Caches generated frames so every case at a size sees the same data"""
+    def __init__(self):
+        self._frames = {}
+        self._postgres = None
+
+    def _frame(self, kind, size, generator):
+        key = (kind, size)
+        if key not in self._frames:
+            self._frames[key] = generator(size)
+        return self._frames[key]
+
+    def aircraft(self, size):
+        return self._frame('aircraft', size, data_generator.generate_aircraft_data)
+
+    def inventory(self, size):
+        return self._frame('inventory', size, data_generator.generate_inventory_data)
+
+    def comm_logs(self, size):
+        return self._frame('comm_logs', size, data_generator.generate_comm_logs)
+
+    def clear(self):
+        self._frames.clear()
+
+    def postgres_available(self):
+        if self._postgres is None:
+            try:
+                import psycopg2
+                psycopg2.connect(
+                    host=os.getenv('PGHOST'),
+                    database=os.getenv('PGDATABASE'),
+                    user=os.getenv('PGUSER'),
+                    password=os.getenv('PGPASSWORD'),
+                    port=os.getenv('PGPORT'),
+                    connect_timeout=3
+                ).close()
+                self._postgres = True
+            except Exception as e:
+                print(f"Postgres unavailable, skipping postgres cases: {e}")
+                self._postgres = False
+        return self._postgres
+
+def run_case(name, group, max_size, repeat, setup, size, ctx, args):
+    result = {'name': name, 'group': group, 'size': size}
+    if max_size is not None and size > max_size and not args.no_caps:
+        result['skipped'] = f'size cap {max_size}'
+        return result
+    teardown = None
+    try:
+        prepared = setup(size, ctx)
+        if prepared is None:
+            result['skipped'] = 'backend unavailable'
+            return result
+        func, rows_per_call, teardown = prepared
+        result.update(measure(func, rows_per_call, args.repeat or repeat,
+                              warmup=args.warmup, track_memory=not args.no_memory))
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        if teardown is not None:
+            teardown()
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline_path, threshold):
+    """Return (name, size, baseline_ms, current_ms) for cases whose p50 regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['name'], r['size']): r for r in baseline['results'] if 'p50_ms' in r}
+    regressions = []
+    for r in results:
+        before = previous.get((r['name'], r['size']))
+        if before is None or 'p50_ms' not in r:
+            continue
+        if r['p50_ms'] > before['p50_ms'] * (1 + threshold):
+            regressions.append((r['name'], r['size'], before['p50_ms'], r['p50_ms']))
+    return regressions
+
+def format_result(r):
+    if 'skipped' in r:
+        return f"{r['name']:<32} {r['size']:>9}  skipped ({r['skipped']})"
+    if 'error' in r:
+        return f"{r['name']:<32} {r['size']:>9}  ERROR {r['error']}"
+    throughput = f"{r['rows_per_s']:>12,.0f} rows/s" if r['rows_per_s'] else ''
+    memory = f"{r['peak_mem_mb']:8.1f} MB" if r['peak_mem_mb'] is not None else ''
+    return (f"{r['name']:<32} {r['size']:>9}  p50 {r['p50_ms']:10.2f} ms  "
+            f"p95 {r['p95_ms']:10.2f} ms  {throughput}  {memory}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data and rendering paths")
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--only', nargs='+', help="Case groups or names to run (e.g. fallback export.csv)")
+    parser.add_argument('--repeat', type=int, help="Override the per-case repeat count")
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--no-caps', action='store_true', help="Run capped cases at every size")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak-memory run")
+    parser.add_argument('--output', default=f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument('--compare', help="Baseline JSON to compare p50 latencies against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed p50 slowdown ratio")
+    args = parser.parse_args()
+
+    cases = [c for c in CASES if not args.only or c[0] in args.only or c[1] in args.only]
+    ctx = Context()
+    results = []
+    for size in sorted(args.sizes):
+        for name, group, max_size, repeat, setup in cases:
+            result = run_case(name, group, max_size, repeat, setup, size, ctx, args)
+            print(format_result(result), flush=True)
+            results.append(result)
+        ctx.clear()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'sizes': sorted(args.sizes)
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for name, size, before, after in regressions:
+            print(f"REGRESSION {name} @ {size}: p50 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Change feed for the aircraft, inventory and communications tables.
+
+Writers publish changes; readers subscribe to them or keep per-table caches
+that are only reloaded after a change, so idle dashboards issue no queries.
+
+Sources of change events:
+- Postgres: statement triggers (installed by Database.create_tables) NOTIFY
+  on CHANNEL with the table and operation; a listener thread holding one
+  dedicated connection forwards them.
+- Fallback store: a watcher thread polls the JSON table files' mtimes, which
+  catches writes from other processes. If the store fell back because
+  Postgres was unreachable, the watcher also probes Postgres and exits once
+  it is back, so the next read reconnects and starts the Postgres listener.
+- In-process writes: Database publishes directly after committing, so a
+  session sees its own writes immediately. Echoes of those writes arriving
+  through NOTIFY or the file watcher are dropped.
+"""
+import json
+import os
+import select
+import threading
+import time
+import metrics
+
+CHANNEL = 'table_changes'
+WATCHED_TABLES = ('aircraft', 'inventory', 'communications')
+PRIMARY_PROBE_INTERVAL = 30.0
+
+class ChangeFeed:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._versions = {}
+        self._local_pids = {}  # backend pid -> None while open, else expiry time
+        self._file_mtimes = {}
+        self._thread = None
+        self._backend = None  # what the running listener watches, see _backend_of
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+
+    def subscribe(self, table, callback):
+        """Call callback(event) on every change to `table`. Returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers.setdefault(table, []).append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                callbacks = self._subscribers.get(table, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+        return unsubscribe
+
+    def version(self, table):
+        return self._versions.get(table, 0)
+
+    def publish(self, table, op, key=None, source='local'):
+        event = {'table': table, 'op': op, 'key': key, 'source': source}
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            callbacks = list(self._subscribers.get(table, []))
+        for callback in callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Change feed subscriber error: {e}")
+
+    def publish_all(self, source):
+        """Invalidate every table, e.g. after a listener reconnect may have missed events"""
+        for table in WATCHED_TABLES:
+            self.publish(table, 'RESYNC', source=source)
+
+    # Echo suppression for writes made by this process
+
+    def add_local_pid(self, pid):
+        now = time.monotonic()
+        with self._lock:
+            for stale in [p for p, expiry in self._local_pids.items() if expiry is not None and expiry < now]:
+                del self._local_pids[stale]
+            self._local_pids[pid] = None
+
+    def remove_local_pid(self, pid, grace=5.0):
+        # Notifications are delivered asynchronously and may arrive after the
+        # writing connection has closed, so keep suppressing its pid briefly.
+        with self._lock:
+            if pid in self._local_pids:
+                self._local_pids[pid] = time.monotonic() + grace
+
+    def _is_local(self, pid):
+        if pid not in self._local_pids:
+            return False
+        expiry = self._local_pids.get(pid)
+        return expiry is None or expiry > time.monotonic()
+
+    def note_local_write(self, table, path):
+        try:
+            self._file_mtimes[table] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+
+    # Listener threads
+
+    @property
+    def listening(self):
+        return self._thread is not None and self._thread.is_alive() and self._ready.is_set()
+
+    @staticmethod
+    def _backend_of(db):
+        if db.using_fallback:
+            return ('fallback', os.path.abspath(db.data_dir))
+        return ('postgres',)
+
+    def start(self, db, timeout=5.0):
+        """Start the listener matching db's backend.
+
+        A running listener for a different backend (e.g. the file watcher
+        started while Postgres was down) is replaced, and every table is
+        invalidated since cached results came from the other store. Blocks
+        until the listener is subscribed so that no change between this call
+        and a subsequent read can be missed.
+        """
+        backend = self._backend_of(db)
+        with self._start_lock:
+            switched = False
+            if self._thread is not None and self._thread.is_alive() and self._backend != backend:
+                self.stop()
+                switched = True
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._ready.clear()
+                if db.using_fallback:
+                    probe = db.connect_primary if db.primary_unavailable else None
+                    target, args = self._watch_files, (db.data_dir, probe)
+                else:
+                    target, args = self._listen_postgres, (db.connect_primary,)
+                self._backend = backend
+                self._thread = threading.Thread(target=target, args=args, name='change-feed', daemon=True)
+                self._thread.start()
+        self._ready.wait(timeout)
+        if switched:
+            self.publish_all('switch')
+        return self.listening
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+        self._backend = None
+
+    def _listen_postgres(self, connect):
+        backoff = 1.0
+        connected_before = False
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = connect()
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                if connected_before:
+                    # Reconnected: anything may have changed while we were away
+                    self.publish_all('postgres')
+                connected_before = True
+                self._ready.set()
+                backoff = 1.0
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        if self._is_local(notify.pid):
+                            continue
+                        try:
+                            payload = json.loads(notify.payload)
+                        except ValueError:
+                            continue
+                        self.publish(payload.get('table'), payload.get('op'), source='postgres')
+            except Exception as e:
+                print(f"Change feed listener error: {e}")
+                self._ready.clear()
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+    def _watch_files(self, data_dir, probe_primary=None, interval=1.0):
+        paths = {table: os.path.join(data_dir, f'{table}.json') for table in WATCHED_TABLES}
+        for table, path in paths.items():
+            self.note_local_write(table, path)
+        self._ready.set()
+        next_probe = time.monotonic() + PRIMARY_PROBE_INTERVAL
+        while not self._stop.wait(interval):
+            if probe_primary is not None and time.monotonic() >= next_probe:
+                next_probe = time.monotonic() + PRIMARY_PROBE_INTERVAL
+                try:
+                    probe_primary().close()
+                except Exception:
+                    pass
+                else:
+                    # Postgres is back: stop listening so reads reload and reconnect
+                    self._ready.clear()
+                    self.publish_all('postgres')
+                    return
+            for table, path in paths.items():
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                if mtime != self._file_mtimes.get(table):
+                    self._file_mtimes[table] = mtime
+                    self.publish(table, 'UPDATE', source='file')
+
+FEED = ChangeFeed()
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def cached_table(table, load, key=None):
+    """Return load(db) for `table`, reusing the last result until the table changes.
+
+    The Database connection is only opened on a cache miss. Results are shared
+    between sessions and must not be mutated by callers. Without a running
+    listener every call reloads.
+    """
+    from database import Database
+
+    cache_key = (table, key)
+    entry = _cache.get(cache_key)
+    if entry is not None and FEED.listening and entry[0] == FEED.version(table):
+        metrics.inc('change_feed_cache_total', 1, 'Cached table lookups', table=table, result='hit')
+        return entry[1]
+    metrics.inc('change_feed_cache_total', 1, 'Cached table lookups', table=table, result='miss')
+
+    # Load from the primary: a replica may not have replayed the change yet,
+    # and its stale result would be cached under the new version
+    db = Database(use_replicas=False)
+    try:
+        FEED.start(db)
+        # Read the version before loading so a change during the load is not lost
+        version = FEED.version(table)
+        data = load(db)
+    finally:
+        db.close()
+    with _cache_lock:
+        _cache[cache_key] = (version, data)
+    return data
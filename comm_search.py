@@ -0,0 +1,144 @@
+"""In-memory inverted index over communications for the fallback store.
+
+Approximates the Postgres full-text search: message_type and message are
+tokenized and lightly stemmed, with message_type weighted higher. All query
+terms must match and a leading '-' excludes a term; a query of only excluded
+terms returns every other message, newest first. Results are ranked with BM25.
+The stemmer only strips common English suffixes (plurals, -ed, -ing), so a
+few words match differently than with Postgres' Snowball stemmer. The index
+is kept per data directory and extended incrementally with messages it has
+not seen yet. Message text never changes after insert, so a status update
+only needs a refresh of the stored records.
+"""
+import heapq
+import math
+import os
+import re
+import threading
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+VOWELS = frozenset('aeiouy')
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to was were with".split()
+)
+FIELD_WEIGHTS = (('message_type', 2.0), ('message', 1.0))
+K1 = 1.2
+B = 0.75
+
+def stem(term):
+    """Strip common English suffixes, e.g. 'engines' and 'engine' both become 'engin'"""
+    if len(term) <= 3 or not term.isalpha():
+        return term
+    if term.endswith('sses'):
+        term = term[:-2]
+    elif term.endswith('ies'):
+        term = term[:-3] + 'y'
+    elif term.endswith('s') and not term.endswith(('ss', 'us', 'is')):
+        term = term[:-1]
+    for suffix in ('ing', 'ed'):
+        root = term[:-len(suffix)]
+        if term.endswith(suffix) and len(root) >= 3 and VOWELS.intersection(root):
+            term = root
+            if term.endswith(('at', 'bl', 'iz')):
+                term += 'e'
+            elif term[-1] == term[-2] and term[-1] not in 'lsz':
+                term = term[:-1]
+            break
+    if term.endswith('e') and len(term) > 3:
+        term = term[:-1]
+    return term
+
+def tokenize(text):
+    return [stem(t) for t in TOKEN_RE.findall(str(text or '').lower()) if t not in STOPWORDS]
+
+def parse_query(query):
+    """Split a query into (required terms, excluded terms)"""
+    required, excluded = [], []
+    for word in str(query or '').split():
+        target = excluded if word.startswith('-') else required
+        target.extend(tokenize(word.lstrip('-')))
+    return required, excluded
+
+class InvertedIndex:
+    def __init__(self):
+        self.postings = {}      # term -> {doc_id: weighted term frequency}
+        self.doc_lengths = {}   # doc_id -> weighted length
+        self.total_length = 0.0
+        self.records = {}
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        doc_id = record['id']
+        if doc_id in self.doc_lengths:
+            return
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(record.get(field)):
+                postings = self.postings.setdefault(term, {})
+                postings[doc_id] = postings.get(doc_id, 0.0) + weight
+                length += weight
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+    def refresh(self, communications, mtime):
+        """Index unseen messages and replace the stored records"""
+        for record in communications:
+            self.add(record)
+        self.records = {record['id']: record for record in communications}
+        self.mtime = mtime
+
+    def search(self, query, limit=20, offset=0):
+        """Return [(score, record)] for one page of results, best first"""
+        required, excluded = parse_query(query)
+        if not required and not excluded:
+            return []
+        postings = [self.postings.get(term) for term in dict.fromkeys(required)]
+        if any(p is None for p in postings):
+            return []
+        if postings:
+            # Intersect starting from the rarest term
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for p in postings[1:]:
+                candidates.intersection_update(p)
+                if not candidates:
+                    return []
+        else:
+            # Only exclusions: everything else matches with a zero score, newest first
+            candidates = set(self.records)
+        for term in excluded:
+            candidates.difference_update(self.postings.get(term, ()))
+
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count if doc_count else 1.0
+        idf = [math.log(1 + (doc_count - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+        def score(doc_id):
+            norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / average_length)
+            total = 0.0
+            for p, term_idf in zip(postings, idf):
+                tf = p[doc_id]
+                total += term_idf * tf * (K1 + 1) / (tf + norm)
+            return total
+
+        ranked = heapq.nlargest(offset + limit, ((score(d), d) for d in candidates if d in self.records))
+        return [(s, self.records[d]) for s, d in ranked[offset:offset + limit]]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def search(data_dir, load_communications, query, limit=20, offset=0):
+    """Search the fallback communications table in data_dir.
+
+    load_communications() is only called when the table file has changed
+    since the index was last refreshed.
+    """
+    path = os.path.join(data_dir, 'communications.json')
+    with _indexes_lock:
+        index = _indexes.setdefault(data_dir, InvertedIndex())
+    with index.lock:
+        mtime = os.stat(path).st_mtime_ns
+        if mtime != index.mtime:
+            index.refresh(load_communications(), mtime)
+        return index.search(query, limit, offset)
@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 from data_generator import generate_comm_logs
 
+SEARCH_PAGE_SIZE = 20
+
 def render_communications_page():
     st.title("📡 Satellite Communications")
     
@@ -19,6 +21,26 @@ def render_communications_page():
         st.metric("Pending Messages", 
                  len(st.session_state['comm_logs'][st.session_state['comm_logs']['status'] == 'Pending']))
     
+    # Full-text search over stored messages
+    st.subheader("Message Search")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search_query = st.text_input("Search messages", placeholder="e.g. engine fire -test")
+    with col2:
+        search_page = st.number_input("Page", min_value=1, value=1, step=1)
+    if search_query:
+        from database import Database
+        db = Database()
+        try:
+            results = db.search_communications(search_query, limit=SEARCH_PAGE_SIZE,
+                                               offset=(search_page - 1) * SEARCH_PAGE_SIZE)
+        finally:
+            db.close()
+        if results.empty:
+            st.info("No matching messages")
+        else:
+            st.dataframe(results, use_container_width=True, hide_index=True)
+
     # Communication logs
     st.subheader("Communication Logs")
     
@@ -3,68 +3,124 @@ import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime, timedelta
-from database import Database
+from change_feed import cached_table
+from fleet_analytics import get_fleet_analytics
+from track_checkpoint import load_aircraft
+import metrics
 
-def create_aircraft_scatter():
-    db = Database()
-    try:
-        aircraft_data = db.get_all_aircraft()
-        fig = px.scatter_mapbox(
-            aircraft_data,
-            lat='latitude',
-            lon='longitude',
-            hover_name='aircraft_id',
-            hover_data=['type', 'altitude', 'speed'],
-            color='type',
-            size_max=15,
-            zoom=3,
-            title='Aircraft Positions'
-        )
-        fig.update_layout(
-            mapbox_style="carto-darkmatter",
-            margin={"r":0,"t":30,"l":0,"b":0},
-            height=400
-        )
-        return fig
-    finally:
-        db.close()
+@metrics.timed('figure_build_seconds', 'Plotly figure build latency')
+def create_aircraft_scatter(aircraft_data=None):
+    if aircraft_data is None:
+        aircraft_data = cached_table('aircraft', load_aircraft)
+    fig = px.scatter_mapbox(
+        aircraft_data,
+        lat='latitude',
+        lon='longitude',
+        hover_name='aircraft_id',
+        hover_data=['type', 'altitude', 'speed'],
+        color='type',
+        size_max=15,
+        zoom=3,
+        title='Aircraft Positions'
+    )
+    fig.update_layout(
+        mapbox_style="carto-darkmatter",
+        margin={"r":0,"t":30,"l":0,"b":0},
+        height=400
+    )
+    return fig
 
-def create_inventory_treemap():
-    db = Database()
-    try:
-        inventory_data = db.get_all_inventory()
-        fig = px.treemap(
-            inventory_data,
-            path=['status', 'item_name'],
-            values='quantity',
-            title='Inventory Distribution'
-        )
-        fig.update_layout(
-            margin={"r":0,"t":30,"l":0,"b":0},
-            height=400
-        )
-        return fig
-    finally:
-        db.close()
+@metrics.timed('figure_build_seconds', 'Plotly figure build latency')
+def create_inventory_treemap(inventory_data=None):
+    if inventory_data is None:
+        inventory_data = cached_table('inventory', lambda db: db.get_all_inventory())
+    fig = px.treemap(
+        inventory_data,
+        path=['status', 'item_name'],
+        values='quantity',
+        title='Inventory Distribution'
+    )
+    fig.update_layout(
+        margin={"r":0,"t":30,"l":0,"b":0},
+        height=400
+    )
+    return fig
 
-def create_communications_timeline():
-    db = Database()
-    try:
-        comm_data = db.get_communications(limit=100)
-        fig = px.timeline(
-            comm_data,
-            x_start='timestamp',
-            y='priority',
-            color='message_type',
-            title='Communications Timeline'
-        )
-        fig.update_layout(
-            xaxis_showgrid=True,
-            height=300
-        )
-        return fig
-    finally:
-        db.close()
+@metrics.timed('figure_build_seconds', 'Plotly figure build latency')
+def create_communications_timeline(comm_data=None):
+    if comm_data is None:
+        comm_data = cached_table('communications', lambda db: db.get_communications(limit=100), key='latest_100')
+    fig = px.timeline(
+        comm_data,
+        x_start='timestamp',
+        y='priority',
+        color='message_type',
+        title='Communications Timeline'
+    )
+    fig.update_layout(
+        xaxis_showgrid=True,
+        height=300
+    )
+    return fig
+
+@metrics.timed('figure_build_seconds', 'Plotly figure build latency')
+def create_density_heatmap(analytics):
+    # Plots pre-binned grid cells, so the figure size is independent of the point count
+    fig = go.Figure(go.Densitymapbox(
+        lat=analytics.density['latitude'],
+        lon=analytics.density['longitude'],
+        z=analytics.density['count'],
+        radius=20,
+        colorscale='Inferno'
+    ))
+    fig.update_layout(
+        mapbox_style="carto-darkmatter",
+        mapbox_center={"lat": 39.8283, "lon": -98.5795},
+        mapbox_zoom=3,
+        margin={"r":0,"t":30,"l":0,"b":0},
+        title=f'Traffic Density ({analytics.points:,} positions)',
+        height=400
+    )
+    return fig
+
+@metrics.timed('figure_build_seconds', 'Plotly figure build latency')
+def create_type_distribution(analytics):
+    by_type = analytics.by_type
+    fig = go.Figure()
+    for column, label in (('speed', 'Speed (knots)'), ('altitude', 'Altitude (ft)')):
+        fig.add_trace(go.Bar(
+            x=by_type['type'],
+            y=by_type[f'{column}_p50'],
+            error_y={
+                'type': 'data',
+                'symmetric': False,
+                'array': by_type[f'{column}_p90'] - by_type[f'{column}_p50'],
+                'arrayminus': by_type[f'{column}_p50'] - by_type[f'{column}_p10']
+            },
+            name=label,
+            yaxis='y' if column == 'speed' else 'y2'
+        ))
+    fig.update_layout(
+        title='Median Speed and Altitude by Type (p10-p90)',
+        barmode='group',
+        yaxis={'title': 'Speed (knots)'},
+        yaxis2={'title': 'Altitude (ft)', 'overlaying': 'y', 'side': 'right'},
+        height=400
+    )
+    return fig
+
+@metrics.timed('figure_build_seconds', 'Plotly figure build latency')
+def create_activity_timeline(analytics):
+    fig = px.area(
+        analytics.activity,
+        x='bucket',
+        y='aircraft',
+        color='type',
+        title='Active Aircraft over Time',
+        labels={'bucket': 'Time', 'aircraft': 'Aircraft'}
+    )
+    fig.update_layout(height=300)
+    return fig
 
 def render_dashboard():
     st.title("Interactive Dashboard")
@@ -80,7 +136,7 @@ def render_dashboard():
     with col2:
         data_type = st.multiselect(
             "Data Types",
-            ["Aircraft", "Inventory", "Communications"],
+            ["Aircraft", "Fleet Analytics", "Inventory", "Communications"],
             default=["Aircraft", "Inventory", "Communications"]
         )
     
@@ -89,6 +145,28 @@ def render_dashboard():
         st.subheader("Aircraft Tracking")
         aircraft_map = create_aircraft_scatter()
         st.plotly_chart(aircraft_map, use_container_width=True)
+
+    # Fleet analytics over position history
+    if "Fleet Analytics" in data_type:
+        st.subheader("Fleet Analytics")
+        window_seconds = {
+            "Last 24 Hours": 24 * 3600,
+            "Last Week": 7 * 24 * 3600,
+            "Last Month": 30 * 24 * 3600
+        }[time_range]
+        # ~288 buckets per range; analytics are recomputed once per bucket
+        analytics = get_fleet_analytics(window_seconds=window_seconds,
+                                        bucket_seconds=max(300, window_seconds // 288))
+        if analytics.points == 0:
+            st.info("No position history recorded in this time range.")
+        else:
+            st.plotly_chart(create_density_heatmap(analytics), use_container_width=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.plotly_chart(create_type_distribution(analytics), use_container_width=True)
+            with col2:
+                st.plotly_chart(create_activity_timeline(analytics), use_container_width=True)
+            st.dataframe(analytics.by_region, use_container_width=True, hide_index=True)
     
     # Inventory analysis
     if "Inventory" in data_type:
@@ -100,18 +178,14 @@ def render_dashboard():
         
         with col2:
             # Add inventory status distribution
-            db = Database()
-            try:
-                inventory_data = db.get_all_inventory()
-                status_counts = inventory_data['status'].value_counts()
-                fig = px.pie(
-                    values=status_counts.values,
-                    names=status_counts.index,
-                    title='Inventory Status Distribution'
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            finally:
-                db.close()
+            inventory_data = cached_table('inventory', lambda db: db.get_all_inventory())
+            status_counts = inventory_data['status'].value_counts()
+            fig = px.pie(
+                values=status_counts.values,
+                names=status_counts.index,
+                title='Inventory Status Distribution'
+            )
+            st.plotly_chart(fig, use_container_width=True)
     
     # Communications analysis
     if "Communications" in data_type:
@@ -120,16 +194,12 @@ def render_dashboard():
         st.plotly_chart(comm_timeline, use_container_width=True)
         
         # Add communication priority distribution
-        db = Database()
-        try:
-            comm_data = db.get_communications(limit=100)
-            priority_counts = comm_data['priority'].value_counts()
-            fig = px.bar(
-                x=priority_counts.index,
-                y=priority_counts.values,
-                title='Communication Priority Distribution',
-                labels={'x': 'Priority', 'y': 'Count'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
-        finally:
-            db.close()
+        comm_data = cached_table('communications', lambda db: db.get_communications(limit=100), key='latest_100')
+        priority_counts = comm_data['priority'].value_counts()
+        fig = px.bar(
+            x=priority_counts.index,
+            y=priority_counts.values,
+            title='Communication Priority Distribution',
+            labels={'x': 'Priority', 'y': 'Count'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
@@ -1,32 +1,308 @@
 import os
+import itertools
+import threading
 import psycopg2
+from psycopg2.extras import execute_values
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import shutil
 import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import time
+import zlib
+import metrics
+import change_feed
+import comm_search
+
+try:
+    import fcntl
+except ImportError:  # Windows: fallback writes are not locked across processes
+    fcntl = None
+
+# Read replicas, e.g. PGREPLICA_HOSTS="replica1:5432,replica2". Replicas share
+# PGDATABASE/PGUSER/PGPASSWORD with the primary.
+REPLICA_MAX_LAG = float(os.getenv('PGREPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('PGREPLICA_LAG_CHECK_INTERVAL', '10'))
+REPLICA_RETRY_INTERVAL = float(os.getenv('PGREPLICA_RETRY_INTERVAL', '30'))
+
+REPLICA_POOL_SIZE = int(os.getenv('PGREPLICA_POOL_SIZE', '8'))
+
+# Position history older than the retention window is pruned by writers, at
+# most once per HISTORY_PRUNE_INTERVAL seconds per process.
+HISTORY_RETENTION_SECONDS = float(os.getenv('AIRCRAFT_HISTORY_RETENTION_HOURS', '48')) * 3600
+HISTORY_PRUNE_INTERVAL = 600
+HISTORY_PRUNE_BATCH = 10000
+HISTORY_PRUNE_LOCK_ID = 0x41445348
+# Concurrent writers may append fallback history slightly out of time order
+HISTORY_ORDER_SLACK = timedelta(seconds=5)
+
+# Lag is NULL (unusable) when the replica is not streaming from the primary:
+# a detached replica has replayed all it received and would otherwise look
+# current. Roles without pg_read_all_stats see the receiver pid but not its
+# status. When streaming, lag is 0 if everything received has been replayed,
+# otherwise the age of the last replayed transaction.
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver
+            WHERE pid IS NOT NULL AND COALESCE(status, 'streaming') = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+def _seek_history(f, key):
+    """Position binary file f at the first history line recorded at or after `key`.
+
+    The log is appended in time order, so this bisects on byte offsets instead
+    of reading from the start.
+    """
+    f.seek(0, os.SEEK_END)
+    lo, hi = 0, f.tell()
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        if mid:
+            f.readline()  # skip to the next line start
+        line = f.readline()
+        if line.endswith(b'\n') and json.loads(line)['recorded_at'] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    f.seek(lo)
+    if lo:
+        f.readline()
+    return f.tell()
+
+def _history_log_id(f):
+    """Identify one incarnation of the history log; compaction replaces the file and its first line"""
+    f.seek(0)
+    return [os.fstat(f.fileno()).st_ino, zlib.crc32(f.readline())]
+
+def parse_replica_hosts(value):
+    """Parse "host[:port],host[:port]" into a list of (host, port) tuples"""
+    replicas = []
+    for entry in (value or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(':')
+        replicas.append((host, port or os.getenv('PGPORT')))
+    return replicas
+
+class ReplicaRouter:
+    """Load-balances read-only queries across replicas.
+
+    Replicas are picked round-robin. A replica is skipped while its measured
+    lag exceeds REPLICA_MAX_LAG, or for REPLICA_RETRY_INTERVAL seconds after a
+    connection error. When no replica qualifies, reads go to the primary.
+    Health, lag and idle connections are shared by all Database instances in
+    the process: an instance checks a connection out on its first replica read
+    and returns it to the pool on close, so most reads pay no connect.
+    """
+    _rotation = itertools.count()
+    _lag = {}             # (host, port) -> (checked_at, lag_seconds)
+    _down_until = {}      # (host, port) -> monotonic time
+    _idle = {}            # (host, port) -> [connection]
+    _state_lock = threading.Lock()
+
+    def __init__(self, replicas):
+        self.replicas = replicas
+        self._connections = {}
+
+    def _connect(self, replica):
+        connection = self._connections.get(replica)
+        if connection is not None and not connection.closed:
+            return connection
+        with self._state_lock:
+            idle = self._idle.get(replica, [])
+            while idle:
+                connection = idle.pop()
+                if not connection.closed:
+                    self._connections[replica] = connection
+                    return connection
+        host, port = replica
+        connection = psycopg2.connect(
+            host=host,
+            database=os.getenv('PGDATABASE'),
+            user=os.getenv('PGUSER'),
+            password=os.getenv('PGPASSWORD'),
+            port=port,
+            connect_timeout=3
+        )
+        connection.set_session(readonly=True, autocommit=True)
+        self._connections[replica] = connection
+        return connection
+
+    def _lag_ok(self, replica, connection):
+        now = time.monotonic()
+        checked = self._lag.get(replica)
+        if checked is None or now - checked[0] > REPLICA_LAG_CHECK_INTERVAL:
+            with connection.cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                value = cursor.fetchone()[0]
+            lag = float('inf') if value is None else float(value)
+            with self._state_lock:
+                self._lag[replica] = (now, lag)
+            if value is None:
+                print(f"Read replica {replica[0]} is not streaming from the primary; skipping it")
+                metrics.inc('db_replica_detached_total', 1, 'Lag checks finding a replica not streaming', replica=replica[0])
+            else:
+                metrics.observe('db_replica_lag_seconds', lag, 'Measured replica replay lag', replica=replica[0])
+            checked = (now, lag)
+        return checked[1] <= REPLICA_MAX_LAG
+
+    def mark_down(self, replica):
+        with self._state_lock:
+            self._down_until[replica] = time.monotonic() + REPLICA_RETRY_INTERVAL
+            self._lag.pop(replica, None)
+            stale = self._idle.pop(replica, [])
+        connection = self._connections.pop(replica, None)
+        if connection is not None:
+            stale.append(connection)
+        for connection in stale:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def pick(self):
+        """Return (replica, cursor) for a healthy replica, or (None, None)"""
+        if not self.replicas:
+            return None, None
+        start = next(self._rotation)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._down_until.get(replica, 0) > time.monotonic():
+                continue
+            try:
+                connection = self._connect(replica)
+                if self._lag_ok(replica, connection):
+                    return replica, connection.cursor()
+            except psycopg2.Error as e:
+                print(f"Read replica {replica[0]} unavailable: {e}")
+                self.mark_down(replica)
+        return None, None
+
+    def close(self):
+        """Return this instance's connections to the process pool"""
+        for replica, connection in self._connections.items():
+            if connection.closed:
+                continue
+            with self._state_lock:
+                idle = self._idle.setdefault(replica, [])
+                if len(idle) < REPLICA_POOL_SIZE:
+                    idle.append(connection)
+                    continue
+            try:
+                connection.close()
+            except Exception:
+                pass
+        self._connections.clear()
+
+# Explicit so derived columns (e.g. search_vector) are not returned
+COMMUNICATION_COLUMNS = ['id', 'timestamp', 'message_type', 'priority', 'message', 'status']
+
+# Weighted document for full-text search, stored as communications.search_vector
+COMMUNICATION_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(message_type, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(message, '')), 'B')"
+)
+
+# Tables below this many heap pages (8 kB each) are read with one scan
+SNAPSHOT_PARALLEL_MIN_PAGES = int(os.getenv('SNAPSHOT_PARALLEL_MIN_PAGES', '4096'))
+
+# Tables readable through read_table_snapshot: (columns, sort columns, ascending)
+SNAPSHOT_TABLES = {
+    'aircraft': (['aircraft_id', 'type', 'latitude', 'longitude', 'altitude', 'speed', 'heading', 'last_update'],
+                 ['aircraft_id'], True),
+    'inventory': (['item_id', 'item_name', 'quantity', 'status', 'last_updated'], ['item_id'], True),
+    'communications': (COMMUNICATION_COLUMNS, ['timestamp'], False),
+}
 
 class Database:
-    def __init__(self):
+    # Schema is checked by the first primary connection of each process
+    _schema_ready = False
+    _search_vector_ready = False
+    _search_vector_warned = False
+    primary_unavailable = False  # True when this instance fell back after a connection error
+    _history_pruned_at = float('-inf')
+
+    def __init__(self, fallback_only=False, data_dir=None, use_replicas=True):
+        """use_replicas=False sends every read to the primary, e.g. for callers
+        that change session state such as search_path."""
+        if fallback_only:
+            self._init_fallback(data_dir)
+            return
+        connection = None
         try:
-            self.connection = psycopg2.connect(
-                host=os.getenv('PGHOST'),
-                database=os.getenv('PGDATABASE'),
-                user=os.getenv('PGUSER'),
-                password=os.getenv('PGPASSWORD'),
-                port=os.getenv('PGPORT')
-            )
-            self.cursor = self.connection.cursor()
+            connection = self.connect_primary()
+            self.connection = connection
+            self.cursor = connection.cursor()
             self.using_fallback = False
-            self.create_tables()
+            self.replicas = ReplicaRouter(parse_replica_hosts(os.getenv('PGREPLICA_HOSTS')) if use_replicas else [])
+            if not Database._schema_ready:
+                self.create_tables()
+                Database._schema_ready = True
+            self.backend_pid = connection.get_backend_pid()
+            change_feed.FEED.add_local_pid(self.backend_pid)
         except Exception as e:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
             print(f"Database connection error: {e}")
             print("Using local file-based fallback database")
-            self.using_fallback = True
-            self.data_dir = os.path.join(tempfile.gettempdir(), 'aerospace_defense_data')
-            os.makedirs(self.data_dir, exist_ok=True)
-            
-            # Initialize empty tables if they don't exist
-            self._init_fallback_tables()
+            self.primary_unavailable = True
+            self._init_fallback(data_dir)
+
+    @staticmethod
+    def connect_primary():
+        return psycopg2.connect(
+            host=os.getenv('PGHOST'),
+            database=os.getenv('PGDATABASE'),
+            user=os.getenv('PGUSER'),
+            password=os.getenv('PGPASSWORD'),
+            port=os.getenv('PGPORT')
+        )
+
+    def _init_fallback(self, data_dir=None):
+        self.using_fallback = True
+        self.data_dir = data_dir or os.path.join(tempfile.gettempdir(), 'aerospace_defense_data')
+        os.makedirs(self.data_dir, exist_ok=True)
+
+        # Initialize empty tables if they don't exist
+        self._init_fallback_tables()
+
+    def _execute(self, statement, sql, params=None, cursor=None, target='primary'):
+        """Execute SQL, recording timing and row count under `statement`"""
+        cursor = cursor or self.cursor
+        if not metrics.ENABLED:
+            cursor.execute(sql, params)
+            return cursor
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        metrics.record_query(statement, time.perf_counter() - start, cursor.rowcount, target=target)
+        return cursor
+
+    def _execute_read(self, statement, sql, params=None):
+        """Execute a SELECT on a replica when one is healthy, else on the primary.
+
+        Returns the cursor holding the result set.
+        """
+        replica, cursor = self.replicas.pick()
+        if replica is not None:
+            try:
+                return self._execute(statement, sql, params, cursor=cursor, target='replica')
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                print(f"Read replica {replica[0]} failed, retrying on primary: {e}")
+                self.replicas.mark_down(replica)
+        return self._execute(statement, sql, params)
 
     def create_tables(self):
         # Aircraft tracking table
@@ -54,18 +330,55 @@ class Database:
             )
         """)
 
-        # Communications log table
-        self.cursor.execute("""
+        # Communications log table. New tables get the full-text search column
+        # and index here; existing ones are upgraded by migrate.py, since adding
+        # a stored column rewrites the whole table.
+        self.cursor.execute("SELECT to_regclass('communications') IS NULL")
+        new_communications = self.cursor.fetchone()[0]
+        self.cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS communications (
                 id SERIAL PRIMARY KEY,
                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 message_type VARCHAR(50),
                 priority VARCHAR(20),
                 message TEXT,
-                status VARCHAR(20)
+                status VARCHAR(20),
+                search_vector tsvector GENERATED ALWAYS AS ({COMMUNICATION_SEARCH_DOCUMENT}) STORED
             )
         """)
+        if new_communications:
+            self._create_index_if_missing(
+                'communications_search_idx',
+                "CREATE INDEX communications_search_idx ON communications USING GIN (search_vector)"
+            )
         
+        # Position history for track trails and replay
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS aircraft_history (
+                id BIGSERIAL PRIMARY KEY,
+                aircraft_id VARCHAR(10) NOT NULL,
+                latitude FLOAT,
+                longitude FLOAT,
+                altitude FLOAT,
+                speed FLOAT,
+                heading FLOAT,
+                recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._create_index_if_missing(
+            'aircraft_last_update_idx',
+            "CREATE INDEX aircraft_last_update_idx ON aircraft (last_update)"
+        )
+        self._create_index_if_missing(
+            'aircraft_history_recorded_at_idx',
+            "CREATE INDEX aircraft_history_recorded_at_idx ON aircraft_history (recorded_at, aircraft_id)"
+        )
+
+        self._create_index_if_missing(
+            'communications_pending_idx',
+            "CREATE INDEX communications_pending_idx ON communications (timestamp) WHERE status = 'Pending'"
+        )
+
         # Users table for authentication
         self.cursor.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -74,14 +387,117 @@ class Database:
             )
         """)
 
+        # Change notifications; see change_feed. One NOTIFY per statement with a
+        # table-level payload: readers invalidate whole tables, and per-row
+        # notifications would serialize batch writers on the notify queue lock.
+        # Created only if missing, since create_tables runs for every process.
+        self.cursor.execute("""
+            DO $$
+            BEGIN
+                IF to_regprocedure('notify_table_statement()') IS NULL THEN
+                    CREATE FUNCTION notify_table_statement() RETURNS trigger AS $fn$
+                    BEGIN
+                        PERFORM pg_notify('%s', json_build_object(
+                            'table', TG_TABLE_NAME,
+                            'op', TG_OP
+                        )::text);
+                        RETURN NULL;
+                    END;
+                    $fn$ LANGUAGE plpgsql;
+                END IF;
+            END $$
+        """ % change_feed.CHANNEL)
+        for table in change_feed.WATCHED_TABLES:
+            # Only create missing triggers: DROP/CREATE on every connection would lock the tables.
+            # Replaces the per-row trigger of earlier versions.
+            self.cursor.execute(f"""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_trigger
+                        WHERE tgname = '{table}_notify_statement' AND tgrelid = '{table}'::regclass
+                    ) THEN
+                        DROP TRIGGER IF EXISTS {table}_notify_change ON {table};
+                        CREATE TRIGGER {table}_notify_statement
+                        AFTER INSERT OR UPDATE OR DELETE ON {table}
+                        FOR EACH STATEMENT EXECUTE FUNCTION notify_table_statement();
+                    END IF;
+                END $$
+            """)
+
         self.connection.commit()
 
+    def _has_search_vector(self):
+        if not Database._search_vector_ready:
+            self._execute('search_vector_check', """
+                SELECT EXISTS (
+                    SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = current_schema()
+                      AND table_name = 'communications' AND column_name = 'search_vector'
+                )
+            """)
+            Database._search_vector_ready = self.cursor.fetchone()[0]
+            self.connection.commit()
+        return Database._search_vector_ready
+
+    def migrate_communications_search(self):
+        """Add the stored search_vector column and its GIN index to an existing communications table.
+
+        Adding the column rewrites the table under an ACCESS EXCLUSIVE lock, so
+        this is run once from migrate.py, not from create_tables. The index is
+        built CONCURRENTLY so writes continue meanwhile.
+        """
+        if not self._has_search_vector():
+            print("Adding communications.search_vector (rewrites the table; writes wait until done)")
+            self._execute('migrate_search_vector', f"""
+                ALTER TABLE communications ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS ({COMMUNICATION_SEARCH_DOCUMENT}) STORED
+            """)
+            self.connection.commit()
+            Database._search_vector_ready = True
+
+        self._execute('migrate_search_index', """
+            SELECT i.indisvalid FROM pg_index i
+            WHERE i.indexrelid = to_regclass('communications_search_idx')
+        """)
+        row = self.cursor.fetchone()
+        self.connection.commit()
+        if row is not None and row[0]:
+            return
+        # CONCURRENTLY cannot run inside a transaction block
+        self.connection.autocommit = True
+        try:
+            if row is not None:
+                # Left invalid by an interrupted concurrent build
+                self._execute('migrate_search_index', "DROP INDEX CONCURRENTLY communications_search_idx")
+            print("Building communications_search_idx concurrently")
+            self._execute('migrate_search_index',
+                          "CREATE INDEX CONCURRENTLY communications_search_idx ON communications USING GIN (search_vector)")
+        finally:
+            self.connection.autocommit = False
+
+    def _create_index_if_missing(self, index_name, ddl):
+        # CREATE INDEX IF NOT EXISTS still locks the table against writes, and
+        # create_tables runs in every process, so check the catalog first.
+        self.cursor.execute(f"""
+            DO $$
+            BEGIN
+                IF to_regclass('{index_name}') IS NULL THEN
+                    {ddl};
+                END IF;
+            END $$
+        """)
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def insert_aircraft(self, aircraft_data):
         if self.using_fallback:
-            aircraft = self._read_fallback_table('aircraft')
-            aircraft_data['last_update'] = datetime.now().isoformat()
-            aircraft[aircraft_data['aircraft_id']] = aircraft_data
-            self._write_fallback_table('aircraft', aircraft)
+            with self._fallback_lock('aircraft'):
+                aircraft = self._read_fallback_table('aircraft')
+                aircraft_data['last_update'] = datetime.now().isoformat()
+                aircraft[aircraft_data['aircraft_id']] = aircraft_data
+                self._write_fallback_table('aircraft', aircraft)
+            self._append_fallback_history([aircraft_data], aircraft_data['last_update'])
+            change_feed.FEED.publish('aircraft', 'UPSERT', aircraft_data['aircraft_id'])
         else:
             sql = """
                 INSERT INTO aircraft (aircraft_id, type, latitude, longitude, altitude, speed, heading)
@@ -96,7 +512,7 @@ class Database:
                     heading = EXCLUDED.heading,
                     last_update = CURRENT_TIMESTAMP
             """
-            self.cursor.execute(sql, (
+            self._execute('upsert_aircraft', sql, (
                 aircraft_data['aircraft_id'],
                 aircraft_data['type'],
                 aircraft_data['latitude'],
@@ -105,8 +521,96 @@ class Database:
                 aircraft_data['speed'],
                 aircraft_data['heading']
             ))
+            self._execute('insert_aircraft_history', """
+                INSERT INTO aircraft_history (aircraft_id, latitude, longitude, altitude, speed, heading, recorded_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                aircraft_data['aircraft_id'],
+                aircraft_data['latitude'],
+                aircraft_data['longitude'],
+                aircraft_data['altitude'],
+                aircraft_data['speed'],
+                aircraft_data['heading'],
+                datetime.now()
+            ))
             self.connection.commit()
+            change_feed.FEED.publish('aircraft', 'UPSERT', aircraft_data['aircraft_id'])
+            self._maybe_prune_history()
 
+    @metrics.timed('db_call_seconds', 'Database method latency')
+    def insert_aircraft_batch(self, records):
+        """Upsert many aircraft in one statement (or one file rewrite for the fallback store).
+
+        If an aircraft_id appears more than once the last record wins.
+        """
+        latest = {}
+        for record in records:
+            latest[record['aircraft_id']] = record
+        if not latest:
+            return 0
+        # History times come from this host's clock, like the windows read back by replay and analytics
+        now = datetime.now()
+        if self.using_fallback:
+            now = now.isoformat()
+            with self._fallback_lock('aircraft'):
+                aircraft = self._read_fallback_table('aircraft')
+                for aircraft_id, record in latest.items():
+                    aircraft[aircraft_id] = dict(record, last_update=now)
+                self._write_fallback_table('aircraft', aircraft)
+            self._append_fallback_history(latest.values(), now)
+        else:
+            sql = """
+                INSERT INTO aircraft (aircraft_id, type, latitude, longitude, altitude, speed, heading)
+                VALUES %s
+                ON CONFLICT (aircraft_id)
+                DO UPDATE SET
+                    type = EXCLUDED.type,
+                    latitude = EXCLUDED.latitude,
+                    longitude = EXCLUDED.longitude,
+                    altitude = EXCLUDED.altitude,
+                    speed = EXCLUDED.speed,
+                    heading = EXCLUDED.heading,
+                    last_update = CURRENT_TIMESTAMP
+            """
+            rows = [
+                (r['aircraft_id'], r['type'], r['latitude'], r['longitude'], r['altitude'], r['speed'], r['heading'])
+                for r in latest.values()
+            ]
+            start = time.perf_counter()
+            execute_values(self.cursor, sql, rows, page_size=1000)
+            metrics.record_query('upsert_aircraft_batch', time.perf_counter() - start, len(rows))
+            start = time.perf_counter()
+            execute_values(
+                self.cursor,
+                "INSERT INTO aircraft_history (aircraft_id, latitude, longitude, altitude, speed, heading, recorded_at) VALUES %s",
+                [(r[0], r[2], r[3], r[4], r[5], r[6], now) for r in rows],
+                page_size=1000
+            )
+            metrics.record_query('insert_aircraft_history_batch', time.perf_counter() - start, len(rows))
+            self.connection.commit()
+            self._maybe_prune_history()
+        change_feed.FEED.publish('aircraft', 'UPSERT')
+        return len(latest)
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
+    def get_aircraft_since(self, since):
+        """Aircraft updated at or after `since`. Read from the primary so nothing is missed to lag."""
+        if self.using_fallback:
+            aircraft = self.get_all_aircraft()
+            return aircraft[pd.to_datetime(aircraft['last_update']) >= since].reset_index(drop=True)
+        else:
+            self._execute(
+                'select_aircraft_since',
+                "SELECT aircraft_id, type, latitude, longitude, altitude, speed, heading, last_update "
+                "FROM aircraft WHERE last_update >= %s",
+                (since,)
+            )
+            columns = [desc[0] for desc in self.cursor.description]
+            rows = self.cursor.fetchall()
+            self.connection.commit()
+            return pd.DataFrame(rows, columns=columns)
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def get_all_aircraft(self):
         if self.using_fallback:
             aircraft = self._read_fallback_table('aircraft')
@@ -114,16 +618,61 @@ class Database:
                 return pd.DataFrame(columns=['aircraft_id', 'type', 'latitude', 'longitude', 'altitude', 'speed', 'heading', 'last_update'])
             return pd.DataFrame(list(aircraft.values()))
         else:
-            self.cursor.execute("SELECT * FROM aircraft")
-            columns = [desc[0] for desc in self.cursor.description]
-            return pd.DataFrame(self.cursor.fetchall(), columns=columns)
+            cursor = self._execute_read('select_aircraft', "SELECT * FROM aircraft")
+            columns = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
 
+    @metrics.timed('db_call_seconds', 'Database method latency')
+    def get_aircraft_history(self, since, until=None, aircraft_ids=None):
+        """Positions recorded in [since, until], ordered by aircraft then time"""
+        columns = ['aircraft_id', 'latitude', 'longitude', 'altitude', 'speed', 'heading', 'recorded_at']
+        if self.using_fallback:
+            since_key = since.isoformat()
+            until_key = until.isoformat() if until is not None else None
+            stop_key = (until + HISTORY_ORDER_SLACK).isoformat() if until is not None else None
+            wanted = set(aircraft_ids) if aircraft_ids is not None else None
+            rows = []
+            path = os.path.join(self.data_dir, 'aircraft_history.jsonl')
+            with metrics.timer('fallback_io_seconds', 'Fallback store file I/O latency', op='read', table='aircraft_history'):
+                with open(path, 'rb') as f:
+                    _seek_history(f, (since - HISTORY_ORDER_SLACK).isoformat())
+                    for line in f:
+                        if not line.endswith(b'\n'):
+                            break  # partial line of a concurrent append
+                        record = json.loads(line)
+                        if stop_key is not None and record['recorded_at'] > stop_key:
+                            break
+                        if record['recorded_at'] < since_key:
+                            continue
+                        if until_key is not None and record['recorded_at'] > until_key:
+                            continue
+                        if wanted is not None and record['aircraft_id'] not in wanted:
+                            continue
+                        rows.append(record)
+            history = pd.DataFrame(rows, columns=columns)
+            history['recorded_at'] = pd.to_datetime(history['recorded_at'])
+            return history.sort_values(['aircraft_id', 'recorded_at'], kind='stable').reset_index(drop=True)
+        else:
+            sql = "SELECT aircraft_id, latitude, longitude, altitude, speed, heading, recorded_at FROM aircraft_history WHERE recorded_at >= %s"
+            params = [since]
+            if until is not None:
+                sql += " AND recorded_at <= %s"
+                params.append(until)
+            if aircraft_ids is not None:
+                sql += " AND aircraft_id = ANY(%s)"
+                params.append(list(aircraft_ids))
+            sql += " ORDER BY aircraft_id, recorded_at"
+            cursor = self._execute_read('select_aircraft_history', sql, params)
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def insert_inventory_item(self, item_data):
         if self.using_fallback:
             inventory = self._read_fallback_table('inventory')
             item_data['last_updated'] = datetime.now().strftime('%Y-%m-%d')
             inventory[item_data['item_id']] = item_data
             self._write_fallback_table('inventory', inventory)
+            change_feed.FEED.publish('inventory', 'UPSERT', item_data['item_id'])
         else:
             sql = """
                 INSERT INTO inventory (item_id, item_name, quantity, status)
@@ -135,14 +684,16 @@ class Database:
                     status = EXCLUDED.status,
                     last_updated = CURRENT_DATE
             """
-            self.cursor.execute(sql, (
+            self._execute('upsert_inventory', sql, (
                 item_data['item_id'],
                 item_data['item_name'],
                 item_data['quantity'],
                 item_data['status']
             ))
             self.connection.commit()
+            change_feed.FEED.publish('inventory', 'UPSERT', item_data['item_id'])
 
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def get_all_inventory(self):
         if self.using_fallback:
             inventory = self._read_fallback_table('inventory')
@@ -150,17 +701,20 @@ class Database:
                 return pd.DataFrame(columns=['item_id', 'item_name', 'quantity', 'status', 'last_updated'])
             return pd.DataFrame(list(inventory.values()))
         else:
-            self.cursor.execute("SELECT * FROM inventory")
-            columns = [desc[0] for desc in self.cursor.description]
-            return pd.DataFrame(self.cursor.fetchall(), columns=columns)
+            cursor = self._execute_read('select_inventory', "SELECT * FROM inventory")
+            columns = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
 
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def log_communication(self, comm_data):
         if self.using_fallback:
-            communications = self._read_fallback_table('communications')
-            comm_data['timestamp'] = datetime.now().isoformat()
-            comm_data['id'] = len(communications) + 1
-            communications.append(comm_data)
-            self._write_fallback_table('communications', communications)
+            with self._fallback_lock('communications'):
+                communications = self._read_fallback_table('communications')
+                comm_data['timestamp'] = datetime.now().isoformat()
+                comm_data['id'] = len(communications) + 1
+                communications.append(comm_data)
+                self._write_fallback_table('communications', communications)
+            change_feed.FEED.publish('communications', 'INSERT', comm_data['id'])
             return comm_data['id']
         else:
             sql = """
@@ -168,15 +722,18 @@ class Database:
                 VALUES (%s, %s, %s, %s)
                 RETURNING id
             """
-            self.cursor.execute(sql, (
+            self._execute('insert_communication', sql, (
                 comm_data['message_type'],
                 comm_data['priority'],
                 comm_data['message'],
                 comm_data['status']
             ))
+            comm_id = self.cursor.fetchone()[0]
             self.connection.commit()
-            return self.cursor.fetchone()[0]
+            change_feed.FEED.publish('communications', 'INSERT', comm_id)
+            return comm_id
 
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def get_communications(self, limit=50):
         if self.using_fallback:
             communications = self._read_fallback_table('communications')
@@ -186,9 +743,183 @@ class Database:
             sorted_comms = sorted(communications, key=lambda x: x['timestamp'], reverse=True)
             return pd.DataFrame(sorted_comms[:limit])
         else:
-            self.cursor.execute("SELECT * FROM communications ORDER BY timestamp DESC LIMIT %s", (limit,))
+            cursor = self._execute_read(
+                'select_communications',
+                f"SELECT {', '.join(COMMUNICATION_COLUMNS)} FROM communications ORDER BY timestamp DESC LIMIT %s",
+                (limit,)
+            )
+            columns = [desc[0] for desc in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
+    def search_communications(self, query, limit=20, offset=0):
+        """Full-text search over message_type and message, best matches first.
+
+        Returns one page of results with a `rank` column. All query words must
+        match; a leading '-' excludes a word.
+        """
+        columns = COMMUNICATION_COLUMNS + ['rank']
+        if self.using_fallback:
+            results = comm_search.search(
+                self.data_dir,
+                lambda: self._read_fallback_table('communications'),
+                query, limit, offset
+            )
+            return pd.DataFrame([dict(record, rank=score) for score, record in results], columns=columns)
+        else:
+            if self._has_search_vector():
+                document = 'search_vector'
+            else:
+                # Not migrated yet: same results, computed per row without the index
+                if not Database._search_vector_warned:
+                    Database._search_vector_warned = True
+                    print("communications.search_vector is missing; run `python migrate.py` to index search")
+                document = f'({COMMUNICATION_SEARCH_DOCUMENT})'
+            sql = f"""
+                SELECT {', '.join(COMMUNICATION_COLUMNS)}, ts_rank_cd({document}, query) AS rank
+                FROM communications, websearch_to_tsquery('english', %s) AS query
+                WHERE {document} @@ query
+                ORDER BY rank DESC, timestamp DESC
+                LIMIT %s OFFSET %s
+            """
+            cursor = self._execute_read('search_communications', sql, (query, limit, offset))
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
+    def get_pending_communications(self):
+        """Pending messages, oldest first. Always read from the primary."""
+        if self.using_fallback:
+            communications = self._read_fallback_table('communications')
+            pending = sorted((c for c in communications if c['status'] == 'Pending'), key=lambda x: x['timestamp'])
+            return pd.DataFrame(pending, columns=COMMUNICATION_COLUMNS)
+        else:
+            self._execute(
+                'select_pending_communications',
+                f"SELECT {', '.join(COMMUNICATION_COLUMNS)} FROM communications WHERE status = 'Pending' ORDER BY timestamp"
+            )
             columns = [desc[0] for desc in self.cursor.description]
-            return pd.DataFrame(self.cursor.fetchall(), columns=columns)
+            rows = self.cursor.fetchall()
+            # End the read transaction so later polls see new messages
+            self.connection.commit()
+            return pd.DataFrame(rows, columns=columns)
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
+    def update_communication_status(self, comm_id, status, expected_status=None):
+        """Set a message's status. With expected_status, only transition from that status.
+
+        Returns True if the message was updated.
+        """
+        if self.using_fallback:
+            with self._fallback_lock('communications'):
+                communications = self._read_fallback_table('communications')
+                for comm in communications:
+                    if comm['id'] == comm_id:
+                        if expected_status is not None and comm['status'] != expected_status:
+                            return False
+                        comm['status'] = status
+                        break
+                else:
+                    return False
+                self._write_fallback_table('communications', communications)
+            updated = True
+        else:
+            sql = "UPDATE communications SET status = %s WHERE id = %s"
+            params = [status, comm_id]
+            if expected_status is not None:
+                sql += " AND status = %s"
+                params.append(expected_status)
+            self._execute('update_communication_status', sql, params)
+            updated = self.cursor.rowcount == 1
+            self.connection.commit()
+        if updated:
+            change_feed.FEED.publish('communications', 'UPDATE', comm_id)
+        return updated
+
+    @metrics.timed('db_call_seconds', 'Database method latency')
+    def read_table_snapshot(self, table_name, workers=4):
+        """Read a whole table as of a single point in time.
+
+        Postgres: small tables (under SNAPSHOT_PARALLEL_MIN_PAGES) are read by
+        a single SELECT on this connection, which already sees one snapshot.
+        Larger tables on PostgreSQL 14+ are read in parallel: a REPEATABLE READ
+        transaction exports its snapshot, and `workers` connections import it
+        and each scan a range of heap pages (ctid ranges), so the parallel
+        scans see exactly the same rows. Older servers lack TID Range Scan,
+        so every range worker would scan the whole table; they get one scan.
+        Fallback: the table file is hard-linked. Writers replace the file
+        rather than rewrite it, so the link is a copy-on-write snapshot.
+        """
+        columns, sort_columns, ascending = SNAPSHOT_TABLES[table_name]
+        if self.using_fallback:
+            path = os.path.join(self.data_dir, f'{table_name}.json')
+            snapshot_path = f'{path}.snapshot.{os.getpid()}.{threading.get_ident()}'
+            try:
+                os.link(path, snapshot_path)
+            except OSError:
+                # No hard links on this filesystem: hold the lock while copying
+                with self._fallback_lock(table_name):
+                    shutil.copyfile(path, snapshot_path)
+            try:
+                with open(snapshot_path, 'r') as f:
+                    data = json.load(f)
+            finally:
+                os.remove(snapshot_path)
+            rows = list(data.values()) if isinstance(data, dict) else data
+            frame = pd.DataFrame(rows, columns=columns)
+        else:
+            select = f"SELECT {', '.join(columns)} FROM {table_name}"
+            self._execute(
+                'snapshot_table_pages',
+                "SELECT pg_relation_size(%s::regclass) / current_setting('block_size')::int",
+                (table_name,)
+            )
+            pages = self.cursor.fetchone()[0]
+            if workers <= 1 or pages < SNAPSHOT_PARALLEL_MIN_PAGES or self.connection.server_version < 140000:
+                rows = self._execute(f'snapshot_scan_{table_name}', select).fetchall()
+                self.connection.commit()
+                frame = pd.DataFrame(rows, columns=columns)
+                return frame.sort_values(sort_columns, ascending=ascending, kind='stable').reset_index(drop=True)
+            self.connection.commit()
+
+            coordinator = self.connect_primary()
+            try:
+                coordinator.set_session(isolation_level='REPEATABLE READ', readonly=True)
+                with coordinator.cursor() as cursor:
+                    cursor.execute("SELECT pg_export_snapshot()")
+                    snapshot_id = cursor.fetchone()[0]
+                workers = min(workers, pages)
+                step = -(-pages // workers)
+                # The last range is open-ended so pages added since sizing are still covered
+                ranges = [(i * step, (i + 1) * step if i < workers - 1 else None) for i in range(workers)]
+
+                def scan(page_range):
+                    start_page, end_page = page_range
+                    sql = select + " WHERE ctid >= %s::tid"
+                    params = [f'({start_page},0)']
+                    if end_page is not None:
+                        sql += " AND ctid < %s::tid"
+                        params.append(f'({end_page},0)')
+                    connection = self.connect_primary()
+                    try:
+                        connection.set_session(isolation_level='REPEATABLE READ', readonly=True)
+                        with connection.cursor() as cursor:
+                            cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+                            start = time.perf_counter()
+                            cursor.execute(sql, params)
+                            rows = cursor.fetchall()
+                            metrics.record_query(f'snapshot_scan_{table_name}', time.perf_counter() - start, len(rows))
+                        connection.rollback()
+                        return rows
+                    finally:
+                        connection.close()
+
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    chunks = list(pool.map(scan, ranges))
+            finally:
+                coordinator.rollback()
+                coordinator.close()
+            frame = pd.DataFrame([row for chunk in chunks for row in chunk], columns=columns)
+        return frame.sort_values(sort_columns, ascending=ascending, kind='stable').reset_index(drop=True)
 
     def _init_fallback_tables(self):
         """Initialize empty tables for fallback storage"""
@@ -207,49 +938,193 @@ class Database:
                 else:
                     with open(path, 'w') as f:
                         json.dump({}, f)
-    
+
+        # Position history is an append-only JSON lines log
+        history_path = os.path.join(self.data_dir, 'aircraft_history.jsonl')
+        if not os.path.exists(history_path):
+            open(history_path, 'a').close()
+
+    def _append_fallback_history(self, records, recorded_at):
+        """Append position records to the fallback history log"""
+        lines = []
+        for record in records:
+            lines.append(json.dumps({
+                'aircraft_id': record['aircraft_id'],
+                'type': record.get('type'),
+                'latitude': record['latitude'],
+                'longitude': record['longitude'],
+                'altitude': record['altitude'],
+                'speed': record['speed'],
+                'heading': record['heading'],
+                'recorded_at': recorded_at
+            }) + '\n')
+        path = os.path.join(self.data_dir, 'aircraft_history.jsonl')
+        with self._fallback_lock('aircraft_history'):
+            with open(path, 'a') as f:
+                f.writelines(lines)
+        self._maybe_prune_history()
+
+    def _maybe_prune_history(self):
+        now = time.monotonic()
+        if now - Database._history_pruned_at < HISTORY_PRUNE_INTERVAL:
+            return
+        Database._history_pruned_at = now
+        try:
+            removed = self.prune_aircraft_history()
+        except Exception as e:
+            print(f"Position history pruning failed: {e}")
+            return
+        if removed:
+            metrics.inc('history_pruned_rows_total', removed, 'Position history rows removed by retention')
+
+    def prune_aircraft_history(self, older_than=None):
+        """Delete position history recorded before older_than (default: the retention window).
+
+        Returns the number of rows removed.
+        """
+        older_than = older_than or datetime.now() - timedelta(seconds=HISTORY_RETENTION_SECONDS)
+        if self.using_fallback:
+            return self._prune_fallback_history(older_than.isoformat())
+        self._execute('history_prune_lock', "SELECT pg_try_advisory_lock(%s)", (HISTORY_PRUNE_LOCK_ID,))
+        if not self.cursor.fetchone()[0]:
+            self.connection.commit()
+            return 0  # another process is pruning
+        removed = 0
+        try:
+            # Small batches keep each transaction's locks and WAL short
+            while True:
+                self._execute('prune_aircraft_history', """
+                    DELETE FROM aircraft_history WHERE id IN (
+                        SELECT id FROM aircraft_history WHERE recorded_at < %s LIMIT %s
+                    )
+                """, (older_than, HISTORY_PRUNE_BATCH))
+                deleted = self.cursor.rowcount
+                self.connection.commit()
+                removed += deleted
+                if deleted < HISTORY_PRUNE_BATCH:
+                    break
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            self._execute('history_prune_unlock', "SELECT pg_advisory_unlock(%s)", (HISTORY_PRUNE_LOCK_ID,))
+            self.connection.commit()
+        return removed
+
+    def _prune_fallback_history(self, cutoff_key):
+        """Compact the history log by rewriting it from the first record at or after cutoff_key"""
+        path = os.path.join(self.data_dir, 'aircraft_history.jsonl')
+        with self._fallback_lock('aircraft_history'):
+            with open(path, 'rb') as f:
+                first = f.readline()
+                if not first or json.loads(first)['recorded_at'] >= cutoff_key:
+                    return 0
+                offset = _seek_history(f, cutoff_key)
+                f.seek(0)
+                removed = 0
+                remaining = offset
+                while remaining:
+                    chunk = f.read(min(remaining, 1 << 20))
+                    removed += chunk.count(b'\n')
+                    remaining -= len(chunk)
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'wb') as out:
+                    shutil.copyfileobj(f, out)
+            os.replace(tmp_path, path)
+        return removed
+
+    def aircraft_history_log_position(self):
+        """Current end of the fallback history log, for replaying later appends"""
+        with self._fallback_lock('aircraft_history'):
+            with open(os.path.join(self.data_dir, 'aircraft_history.jsonl'), 'rb') as f:
+                return {'log': _history_log_id(f), 'offset': os.fstat(f.fileno()).st_size}
+
+    def read_aircraft_history_log(self, position):
+        """Fallback history records appended after `position`, in write order.
+
+        Returns None if the log has been compacted since the position was taken.
+        """
+        records = []
+        with open(os.path.join(self.data_dir, 'aircraft_history.jsonl'), 'rb') as f:
+            if _history_log_id(f) != position['log'] or os.fstat(f.fileno()).st_size < position['offset']:
+                return None
+            f.seek(position['offset'])
+            for line in f:
+                # A concurrent append may leave a partial last line; it is replayed next time
+                if not line.endswith(b'\n'):
+                    break
+                records.append(json.loads(line))
+        return records
+
+    @contextmanager
+    def _fallback_lock(self, table_name):
+        """Serialize read-modify-write of a fallback table across processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.data_dir, f'{table_name}.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
     def _read_fallback_table(self, table_name):
         """Read data from fallback storage"""
         path = os.path.join(self.data_dir, f'{table_name}.json')
-        with open(path, 'r') as f:
-            return json.load(f)
+        with metrics.timer('fallback_io_seconds', 'Fallback store file I/O latency', op='read', table=table_name):
+            with open(path, 'r') as f:
+                return json.load(f)
     
     def _write_fallback_table(self, table_name, data):
         """Write data to fallback storage"""
         path = os.path.join(self.data_dir, f'{table_name}.json')
-        with open(path, 'w') as f:
-            json.dump(data, f)
+        with metrics.timer('fallback_io_seconds', 'Fallback store file I/O latency', op='write', table=table_name):
+            # Write-then-rename so readers in other processes never see a partial file
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        change_feed.FEED.note_local_write(table_name, path)
     
     def close(self):
         if not self.using_fallback:
+            # backend_pid is kept because the connection may already be broken
+            change_feed.FEED.remove_local_pid(self.backend_pid)
+            self.replicas.close()
             self.cursor.close()
             self.connection.close()
 
     # User authentication methods for fallback
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def check_user_credentials(self, username, password_hash):
         if self.using_fallback:
             users = self._read_fallback_table('users')
             return username in users and users[username] == password_hash
         else:
-            self.cursor.execute("SELECT password_hash FROM users WHERE username = %s", (username,))
-            result = self.cursor.fetchone()
+            cursor = self._execute_read('select_user_credentials', "SELECT password_hash FROM users WHERE username = %s", (username,))
+            result = cursor.fetchone()
             return result and result[0] == password_hash
     
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def user_exists(self, username):
         if self.using_fallback:
             users = self._read_fallback_table('users')
             return username in users
         else:
-            self.cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
+            # Uniqueness check guards a write, so it must see the primary
+            self._execute('select_user_exists', "SELECT username FROM users WHERE username = %s", (username,))
             return self.cursor.fetchone() is not None
     
+    @metrics.timed('db_call_seconds', 'Database method latency')
     def add_user(self, username, password_hash):
         if self.using_fallback:
             users = self._read_fallback_table('users')
             users[username] = password_hash
             self._write_fallback_table('users', users)
         else:
-            self.cursor.execute(
+            self._execute(
+                'insert_user',
                 "INSERT INTO users (username, password_hash) VALUES (%s, %s)",
                 (username, password_hash)
             )
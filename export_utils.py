@@ -2,39 +2,44 @@ import streamlit as st
 import pandas as pd
 from io import BytesIO
 from datetime import datetime
-from database import Database
+from change_feed import cached_table
+import metrics
 
+EXPORT_SCAN_WORKERS = 4
+
+@metrics.timed('export_seconds', 'Export pipeline latency')
 def export_to_excel(df, filename):
+    metrics.inc('export_rows_total', len(df), 'Rows exported', format='xlsx')
     output = BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         df.to_excel(writer, index=False)
     output.seek(0)
     return output
 
+@metrics.timed('export_seconds', 'Export pipeline latency')
 def export_to_csv(df, filename):
+    metrics.inc('export_rows_total', len(df), 'Rows exported', format='csv')
     return df.to_csv(index=False).encode('utf-8')
 
+@metrics.timed('export_seconds', 'Export pipeline latency')
 def get_exportable_data(data_type, filters=None):
-    db = Database()
-    try:
-        if data_type == "inventory":
-            data = db.get_all_inventory()
-        elif data_type == "aircraft":
-            data = db.get_all_aircraft()
-        elif data_type == "communications":
-            data = db.get_communications(limit=None)
-        
-        if filters:
-            for column, value in filters.items():
-                if value:
-                    if isinstance(value, list):
-                        data = data[data[column].isin(value)]
-                    else:
-                        data = data[data[column].str.contains(value, case=False, na=False)]
-        
-        return data
-    finally:
-        db.close()
+    # One consistent snapshot even while ingest keeps writing, taken again
+    # only after the table changes rather than on every rerun of the page
+    data = cached_table(
+        data_type,
+        lambda db: db.read_table_snapshot(data_type, workers=EXPORT_SCAN_WORKERS),
+        key='snapshot'
+    )
+
+    if filters:
+        for column, value in filters.items():
+            if value:
+                if isinstance(value, list):
+                    data = data[data[column].isin(value)]
+                else:
+                    data = data[data[column].str.contains(value, case=False, na=False)]
+
+    return data
 
 def render_export_page():
     st.title("📊 Data Export and Reports")
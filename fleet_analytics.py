@@ -0,0 +1,124 @@
+"""Fleet analytics over aircraft position history.
+
+All statistics are computed with grouped pandas/NumPy operations over the
+whole window at once: per-type and per-region speed/altitude distributions,
+a lat/lon density grid, and activity per time bucket. Results are cached per
+bucket-aligned time window, so dashboard reruns within a bucket reuse them
+instead of rescanning millions of points.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+DEFAULT_WINDOW_SECONDS = 24 * 3600
+DEFAULT_BUCKET_SECONDS = 300
+DEFAULT_CELL_DEGREES = 1.0
+QUANTILES = [0.1, 0.5, 0.9]
+
+def _distribution(frame, keys):
+    """count/mean/std and quantiles of speed and altitude per group"""
+    if frame.empty:
+        return pd.DataFrame(columns=keys + ['points', 'aircraft'])
+    grouped = frame.groupby(keys, observed=True)[['speed', 'altitude']]
+    summary = grouped.agg(['count', 'mean', 'std'])
+    quantiles = grouped.quantile(QUANTILES).unstack()
+    quantiles.columns = pd.MultiIndex.from_tuples([(column, f'p{int(q * 100)}') for column, q in quantiles.columns])
+    summary = summary.join(quantiles)
+    summary.columns = [f'{column}_{stat}' for column, stat in summary.columns]
+    summary = summary.drop(columns='altitude_count').rename(columns={'speed_count': 'points'})
+    summary['aircraft'] = frame.groupby(keys, observed=True)['aircraft_id'].nunique()
+    return summary.reset_index()
+
+def type_statistics(frame):
+    return _distribution(frame, ['type'])
+
+def region_ids(frame, cell_degrees):
+    """Label each point with the lower-left corner of its lat/lon grid cell"""
+    lat_cell = np.floor(frame['latitude'].to_numpy() / cell_degrees) * cell_degrees
+    lon_cell = np.floor(frame['longitude'].to_numpy() / cell_degrees) * cell_degrees
+    return lat_cell, lon_cell
+
+def region_statistics(frame, cell_degrees=10.0):
+    lat_cell, lon_cell = region_ids(frame, cell_degrees)
+    return _distribution(frame.assign(region_lat=lat_cell, region_lon=lon_cell), ['region_lat', 'region_lon'])
+
+def _cell_edges(values, cell_degrees):
+    """Cell boundaries covering values, with the maximum inside the last cell rather than on its edge"""
+    low = np.floor(values.min() / cell_degrees)
+    high = np.floor(values.max() / cell_degrees) + 1
+    return np.arange(low, high + 1) * cell_degrees
+
+def density_grid(frame, cell_degrees=DEFAULT_CELL_DEGREES):
+    """Point counts per grid cell as a long frame of (latitude, longitude, count) cell centres"""
+    if frame.empty:
+        return pd.DataFrame(columns=['latitude', 'longitude', 'count'])
+    lat = frame['latitude'].to_numpy(dtype=float)
+    lon = frame['longitude'].to_numpy(dtype=float)
+    lat_edges = _cell_edges(lat, cell_degrees)
+    lon_edges = _cell_edges(lon, cell_degrees)
+    counts, _, _ = np.histogram2d(lat, lon, bins=[lat_edges, lon_edges])
+    lat_index, lon_index = np.nonzero(counts)
+    return pd.DataFrame({
+        'latitude': lat_edges[lat_index] + cell_degrees / 2,
+        'longitude': lon_edges[lon_index] + cell_degrees / 2,
+        'count': counts[lat_index, lon_index].astype(np.int64)
+    })
+
+def activity_over_time(frame, bucket_seconds=DEFAULT_BUCKET_SECONDS):
+    """Position updates and distinct aircraft per time bucket and type"""
+    buckets = frame['recorded_at'].dt.floor(f'{int(bucket_seconds)}s')
+    grouped = frame.assign(bucket=buckets).groupby(['bucket', 'type'], observed=True)
+    return grouped.agg(updates=('aircraft_id', 'size'), aircraft=('aircraft_id', 'nunique')).reset_index()
+
+class FleetAnalytics:
+    def __init__(self, start, end, points, by_type, by_region, density, activity):
+        self.start = start
+        self.end = end
+        self.points = points
+        self.by_type = by_type
+        self.by_region = by_region
+        self.density = density
+        self.activity = activity
+
+@metrics.timed('analytics_build_seconds', 'Fleet analytics computation latency')
+def compute_analytics(history, aircraft, start, end, bucket_seconds=DEFAULT_BUCKET_SECONDS,
+                      cell_degrees=DEFAULT_CELL_DEGREES):
+    """history: aircraft_history rows; aircraft: current aircraft rows, used for the type of each aircraft"""
+    types = aircraft[['aircraft_id', 'type']].drop_duplicates('aircraft_id')
+    frame = history.merge(types, on='aircraft_id', how='left')
+    frame['type'] = frame['type'].fillna('Unknown').astype('category')
+    frame['aircraft_id'] = frame['aircraft_id'].astype('category')
+    frame['recorded_at'] = pd.to_datetime(frame['recorded_at'])
+    return FleetAnalytics(
+        start,
+        end,
+        len(frame),
+        type_statistics(frame),
+        region_statistics(frame),
+        density_grid(frame, cell_degrees),
+        activity_over_time(frame, bucket_seconds)
+    )
+
+@lru_cache(maxsize=4)
+def _cached_analytics(window_end, window_seconds, bucket_seconds, cell_degrees):
+    from database import Database
+
+    start = window_end - timedelta(seconds=window_seconds)
+    db = Database()
+    try:
+        history = db.get_aircraft_history(start, window_end)
+        aircraft = db.get_all_aircraft()
+    finally:
+        db.close()
+    return compute_analytics(history, aircraft, start, window_end, bucket_seconds, cell_degrees)
+
+def get_fleet_analytics(window_seconds=DEFAULT_WINDOW_SECONDS, bucket_seconds=DEFAULT_BUCKET_SECONDS,
+                        cell_degrees=DEFAULT_CELL_DEGREES, now=None):
+    """Analytics for the last window_seconds, recomputed once per time bucket"""
+    now = now or datetime.now()
+    epoch = int(now.timestamp()) // bucket_seconds * bucket_seconds
+    return _cached_analytics(datetime.fromtimestamp(epoch), window_seconds, bucket_seconds, cell_degrees)
@@ -0,0 +1,284 @@
+"""Standalone track ingestion service.
+
+Reads aircraft track updates as JSON lines (one object with aircraft_id, type,
+latitude, longitude, altitude, speed and heading per line) and writes them
+to the store from a pool of worker processes, outside the Streamlit app.
+
+Updates are sharded by a stable hash of aircraft_id, so each aircraft is
+always handled by the same worker, in arrival order. Each worker keeps only
+the latest update per aircraft within a flush window and writes the window as
+one batch.
+
+Usage:
+    python ingest_service.py --workers 4 < updates.jsonl
+    python ingest_service.py --input updates.jsonl --flush-interval 0.5
+    python ingest_service.py --simulate 5000 --rate 20000 --duration 60
+"""
+import argparse
+import json
+import multiprocessing as mp
+import queue
+import random
+import signal
+import sys
+import threading
+import time
+import zlib
+
+REQUIRED_FIELDS = ('aircraft_id', 'type', 'latitude', 'longitude', 'altitude', 'speed', 'heading')
+
+def shard_for(aircraft_id, num_shards):
+    # crc32 rather than hash(): str hashes are salted per process
+    return zlib.crc32(str(aircraft_id).encode('utf-8')) % num_shards
+
+def worker_main(shard, updates, results, flush_interval, max_batch, fallback_only, data_dir):
+    # Ctrl-C reaches the whole process group; the parent's None sentinel drives
+    # shutdown so pending updates are flushed
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from database import Database
+
+    db = None
+    pending = {}
+    stats = {'shard': shard, 'received': 0, 'written': 0, 'batches': 0, 'errors': 0}
+    deadline = time.monotonic() + flush_interval
+
+    def flush():
+        if not pending:
+            return
+        try:
+            stats['written'] += db.insert_aircraft_batch(list(pending.values()))
+            stats['batches'] += 1
+        except Exception as e:
+            stats['errors'] += 1
+            print(f"[worker {shard}] batch write failed: {e}", file=sys.stderr)
+            if not db.using_fallback:
+                db.connection.rollback()
+        pending.clear()
+
+    try:
+        db = Database(fallback_only=fallback_only, data_dir=data_dir)
+        while True:
+            try:
+                chunk = updates.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                chunk = []
+            if chunk is None:
+                break
+            for update in chunk:
+                # Last update wins; re-inserting keeps batch order by latest arrival
+                pending.pop(update['aircraft_id'], None)
+                pending[update['aircraft_id']] = update
+            stats['received'] += len(chunk)
+            if len(pending) >= max_batch or time.monotonic() >= deadline:
+                flush()
+                deadline = time.monotonic() + flush_interval
+        flush()
+    finally:
+        if db is not None:
+            db.close()
+        results.put(stats)
+
+def put_while_alive(q, item, process, poll=0.5):
+    """Put item on a worker's queue, waiting while it is full. Returns False if the worker has exited."""
+    while True:
+        try:
+            q.put(item, timeout=poll)
+            return True
+        except queue.Full:
+            if not process.is_alive():
+                return False
+
+class Dispatcher:
+    """Routes updates to per-worker queues in small chunks to amortize IPC.
+
+    A background thread drains partial chunks every max_delay seconds so a
+    slow input stream does not leave updates sitting in the buffers. If a
+    worker exits, the next submit raises rather than blocking on its full queue.
+    """
+
+    def __init__(self, queues, processes, chunk_size=256, max_delay=0.05):
+        self.queues = queues
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.max_delay = max_delay
+        self.error = None
+        self._buffers = [[] for _ in queues]
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='ingest-dispatch', daemon=True)
+        self._flusher.start()
+
+    def submit(self, update):
+        if self.error is not None:
+            raise self.error
+        shard = shard_for(update['aircraft_id'], len(self.queues))
+        with self._lock:
+            buffer = self._buffers[shard]
+            buffer.append(update)
+            if len(buffer) >= self.chunk_size:
+                self._send(shard)
+
+    def _send(self, shard):
+        if self._buffers[shard]:
+            if not put_while_alive(self.queues[shard], self._buffers[shard], self.processes[shard]):
+                raise RuntimeError(f"{self.processes[shard].name} exited (code {self.processes[shard].exitcode})")
+            self._buffers[shard] = []
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.max_delay):
+            try:
+                # Workers only exit after the None sentinel, so any exit now is a failure
+                for process in self.processes:
+                    if not process.is_alive():
+                        raise RuntimeError(f"{process.name} exited (code {process.exitcode})")
+                self.drain()
+            except RuntimeError as e:
+                self.error = e
+                return
+
+    def drain(self):
+        with self._lock:
+            for shard in range(len(self.queues)):
+                self._send(shard)
+
+    def close(self):
+        self._closed.set()
+        self._flusher.join()
+        self.drain()
+
+def parse_update(line):
+    update = json.loads(line)
+    missing = [field for field in REQUIRED_FIELDS if field not in update]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+    return {field: update[field] for field in REQUIRED_FIELDS}
+
+def read_updates(stream):
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield parse_update(line)
+        except ValueError as e:
+            print(f"Skipping line {line_number}: {e}", file=sys.stderr)
+
+def simulate_updates(num_aircraft, rate, duration):
+    """Random-walk track updates for num_aircraft aircraft at roughly `rate` per second"""
+    aircraft_types = ['F-22', 'F-35', 'F-16', 'C-130', 'KC-135']
+    fleet = [{
+        'aircraft_id': f'AC{i:06d}',
+        'type': random.choice(aircraft_types),
+        'latitude': random.uniform(25, 49),
+        'longitude': random.uniform(-125, -70),
+        'altitude': random.uniform(25000, 45000),
+        'speed': random.uniform(400, 1200),
+        'heading': random.uniform(0, 360)
+    } for i in range(num_aircraft)]
+    start = time.monotonic()
+    sent = 0
+    while duration is None or time.monotonic() - start < duration:
+        aircraft = random.choice(fleet)
+        aircraft['latitude'] += random.uniform(-0.01, 0.01)
+        aircraft['longitude'] += random.uniform(-0.01, 0.01)
+        aircraft['heading'] = (aircraft['heading'] + random.uniform(-5, 5)) % 360
+        yield dict(aircraft)
+        sent += 1
+        if rate and sent % 1000 == 0:
+            ahead = sent / rate - (time.monotonic() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+def run(updates, workers, flush_interval, max_batch, fallback_only=False, data_dir=None):
+    ctx = mp.get_context('spawn')
+    queues = [ctx.Queue(maxsize=1024) for _ in range(workers)]
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=worker_main,
+            args=(shard, queues[shard], results, flush_interval, max_batch, fallback_only, data_dir),
+            name=f'ingest-worker-{shard}',
+            daemon=True
+        )
+        for shard in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    dispatcher = Dispatcher(queues, processes)
+    start = time.monotonic()
+    submitted = 0
+    try:
+        for update in updates:
+            dispatcher.submit(update)
+            submitted += 1
+    except KeyboardInterrupt:
+        print("Interrupted, flushing workers", file=sys.stderr)
+    except RuntimeError as e:
+        print(f"Stopping: {e}", file=sys.stderr)
+    finally:
+        try:
+            dispatcher.close()
+        except RuntimeError as e:
+            print(f"Stopping: {e}", file=sys.stderr)
+        for q, process in zip(queues, processes):
+            put_while_alive(q, None, process)
+        stats = collect_stats(results, processes)
+        for q, process in zip(queues, processes):
+            process.join()
+            if process.exitcode:
+                # Nobody will read what is left; don't block exit flushing it
+                q.cancel_join_thread()
+
+    elapsed = time.monotonic() - start
+    written = sum(s['written'] for s in stats)
+    failed = [process.name for process in processes if process.exitcode]
+    print(f"Submitted {submitted} updates in {elapsed:.1f}s ({submitted / elapsed if elapsed else 0:,.0f}/s), "
+          f"wrote {written} rows in {sum(s['batches'] for s in stats)} batches, "
+          f"coalesced {submitted - written}, errors {sum(s['errors'] for s in stats)}")
+    if failed:
+        print(f"Workers failed: {', '.join(failed)}", file=sys.stderr)
+    return stats, failed
+
+def collect_stats(results, processes, poll=1.0):
+    """Gather each worker's final stats, without waiting on workers that died before reporting"""
+    stats = []
+    while len(stats) < len(processes):
+        try:
+            stats.append(results.get(timeout=poll))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    # Stats put by workers that exited during the last poll
+    while len(stats) < len(processes):
+        try:
+            stats.append(results.get(timeout=0.1))
+        except queue.Empty:
+            break
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest aircraft track updates with sharded worker processes")
+    parser.add_argument('--input', help="JSON lines file of track updates (default: stdin)")
+    parser.add_argument('--workers', type=int, default=mp.cpu_count())
+    parser.add_argument('--flush-interval', type=float, default=1.0, help="Seconds per coalescing window")
+    parser.add_argument('--max-batch', type=int, default=5000, help="Flush early once this many aircraft are pending")
+    parser.add_argument('--fallback', action='store_true', help="Write to the file-based fallback store")
+    parser.add_argument('--data-dir', help="Fallback store directory")
+    parser.add_argument('--simulate', type=int, metavar='AIRCRAFT', help="Generate random updates for this many aircraft")
+    parser.add_argument('--rate', type=float, default=10000, help="Simulated updates per second (0 = unthrottled)")
+    parser.add_argument('--duration', type=float, help="Stop simulating after this many seconds")
+    args = parser.parse_args()
+
+    if args.simulate:
+        updates = simulate_updates(args.simulate, args.rate, args.duration)
+        _, failed = run(updates, args.workers, args.flush_interval, args.max_batch, args.fallback, args.data_dir)
+    elif args.input:
+        with open(args.input) as f:
+            _, failed = run(read_updates(f), args.workers, args.flush_interval, args.max_batch, args.fallback, args.data_dir)
+    else:
+        _, failed = run(read_updates(sys.stdin), args.workers, args.flush_interval, args.max_batch, args.fallback, args.data_dir)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
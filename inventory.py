@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from database import Database
+from change_feed import cached_table
 from styles import apply_custom_styles
 
 
@@ -8,8 +9,6 @@ def render_inventory_page():
   apply_custom_styles()
   st.title("Inventory Management")
 
-  db = Database()
-
   # Add new item form with improved styling
   with st.expander("Add New Item", expanded=False):
     st.markdown('<div class="inventory-form">', unsafe_allow_html=True)
@@ -41,7 +40,11 @@ def render_inventory_page():
             'quantity': new_quantity,
             'status': new_status
         }
-        db.insert_inventory_item(item_data)
+        db = Database()
+        try:
+          db.insert_inventory_item(item_data)
+        finally:
+          db.close()
         st.success(f"Added item {new_item_name} to inventory")
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -57,7 +60,8 @@ def render_inventory_page():
                                 placeholder="Enter item name or ID")
 
   # Display inventory with filters
-  inventory_data = db.get_all_inventory()
+  # Only re-queried after the inventory table changes
+  inventory_data = cached_table('inventory', lambda db: db.get_all_inventory())
   if status_filter:
     inventory_data = inventory_data[inventory_data['status'].isin(
         status_filter)]
@@ -93,5 +97,3 @@ def render_inventory_page():
                    "status": "Status",
                    "last_updated": "Last Updated"
                })
-
-  db.close()
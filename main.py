@@ -1,4 +1,5 @@
-
+import importlib
+import os
 import streamlit as st
 
 # Configure Streamlit page before any other imports
@@ -8,15 +9,84 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Now import all other dependencies
-import folium
-from streamlit_folium import folium_static
+# Only the modules needed for the login screen are imported up front. Page
+# modules (and the plotly/openpyxl/psycopg2 stack they pull in) are loaded on
+# first navigation; Python's module cache makes later visits free.
 from auth import login, check_authentication
-from inventory import render_inventory_page
-from communications import render_communications_page
-from data_generator import generate_aircraft_data
 from styles import apply_custom_styles
-from export_utils import render_export_page
+import metrics
+
+PAGE_RENDERERS = {
+    "inventory": ("inventory", "render_inventory_page"),
+    "communications": ("communications", "render_communications_page"),
+    "export": ("export_utils", "render_export_page"),
+    "metrics": ("metrics", "render_metrics_page"),
+}
+
+# Prometheus scrape endpoint; the server is started once per process
+if metrics.ENABLED and os.getenv('METRICS_PORT'):
+    metrics.start_http_server(int(os.getenv('METRICS_PORT')))
+
+def render_page(page_key):
+    module_name, func_name = PAGE_RENDERERS[page_key]
+    module = importlib.import_module(module_name)
+    getattr(module, func_name)()
+
+@metrics.timed('map_build_seconds', 'Folium map build latency')
+def build_aircraft_map(aircraft_data):
+    import folium
+
+    m = folium.Map(location=[39.8283, -98.5795], zoom_start=4)
+
+    for _, aircraft in aircraft_data.iterrows():
+        folium.Marker(
+            [aircraft['latitude'], aircraft['longitude']],
+            popup=f"""
+                Aircraft: {aircraft['aircraft_id']}<br>
+                Type: {aircraft['type']}<br>
+                Altitude: {aircraft['altitude']:.0f} ft<br>
+                Speed: {aircraft['speed']:.0f} knots
+            """,
+            icon=folium.Icon(color='red', icon='plane', prefix='fa')
+        ).add_to(m)
+
+    metrics.inc('map_markers_total', len(aircraft_data), 'Markers added to folium maps')
+    return m
+
+def render_home_page():
+    from streamlit_folium import folium_static
+    from data_generator import generate_aircraft_data
+
+    st.title("Aerospace & Defense Home")
+
+    # Update aircraft data periodically
+    if 'aircraft_data' not in st.session_state:
+        st.session_state['aircraft_data'] = generate_aircraft_data()
+
+    # Key metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Active Aircraft", len(st.session_state['aircraft_data']))
+    with col2:
+        st.metric("Average Altitude", f"{st.session_state['aircraft_data']['altitude'].mean():.0f} ft")
+    with col3:
+        st.metric("Average Speed", f"{st.session_state['aircraft_data']['speed'].mean():.0f} knots")
+
+    # Aircraft map
+    st.subheader("Aircraft Positions")
+    m = build_aircraft_map(st.session_state['aircraft_data'])
+
+    with st.container():
+      folium_static(m, width=800)
+      st.markdown('</div>', unsafe_allow_html=True)
+
+    if st.checkbox("Show track replay"):
+        from track_replay import render_replay_section
+        render_replay_section()
+
+    # Aircraft list
+    st.subheader("Active Aircraft")
+    st.dataframe(st.session_state['aircraft_data'], use_container_width=True)
 
 def main():
     # Apply custom styles
@@ -42,6 +112,8 @@ def main():
             "Communications": "communications",
             "Export & Reports": "export"
         }
+        if metrics.ENABLED:
+            pages["Metrics"] = "metrics"
 
         for page_name, page_key in pages.items():
             if st.sidebar.button(page_name):
@@ -58,51 +130,9 @@ def main():
 
         # Page rendering
         if st.session_state['page'] == 'dashboard':
-            st.title("Aerospace & Defense Home")
-
-            # Update aircraft data periodically
-            if 'aircraft_data' not in st.session_state:
-                st.session_state['aircraft_data'] = generate_aircraft_data()
-
-            # Key metrics
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Active Aircraft", len(st.session_state['aircraft_data']))
-            with col2:
-                st.metric("Average Altitude", f"{st.session_state['aircraft_data']['altitude'].mean():.0f} ft")
-            with col3:
-                st.metric("Average Speed", f"{st.session_state['aircraft_data']['speed'].mean():.0f} knots")
-
-            # Aircraft map
-            st.subheader("Aircraft Positions")
-            m = folium.Map(location=[39.8283, -98.5795], zoom_start=4)
-
-            for _, aircraft in st.session_state['aircraft_data'].iterrows():
-                folium.Marker(
-                    [aircraft['latitude'], aircraft['longitude']],
-                    popup=f"""
-                        Aircraft: {aircraft['aircraft_id']}<br>
-                        Type: {aircraft['type']}<br>
-                        Altitude: {aircraft['altitude']:.0f} ft<br>
-                        Speed: {aircraft['speed']:.0f} knots
-                    """,
-                    icon=folium.Icon(color='red', icon='plane', prefix='fa')
-                ).add_to(m)
-
-            with st.container():
-              folium_static(m, width=800)
-              st.markdown('</div>', unsafe_allow_html=True)
-
-            # Aircraft list
-            st.subheader("Active Aircraft")
-            st.dataframe(st.session_state['aircraft_data'], use_container_width=True)
-
-        elif st.session_state['page'] == 'inventory':
-            render_inventory_page()
-        elif st.session_state['page'] == 'communications':
-            render_communications_page()
-        elif st.session_state['page'] == 'export':
-            render_export_page()
+            render_home_page()
+        elif st.session_state['page'] in PAGE_RENDERERS:
+            render_page(st.session_state['page'])
 
         # Data source note
         st.markdown("Data is collected from various sources, including real-time aircraft tracking systems, operational databases, and simulations. This data is dynamically updated and visualized on the dashboard.")
@@ -0,0 +1,345 @@
+"""Priority dispatch of pending communications with SLA tracking.
+
+Pending messages go into a priority queue ordered by (priority, created
+time), so whenever a worker becomes free it takes the oldest High message
+ahead of any Medium or Low one. Handling is not preempted mid-message.
+Each worker moves its message Pending -> Received, runs the handler, then
+marks it Acknowledged. If the handler fails the message goes back to
+Pending and is queued again, until MAX_ATTEMPTS failures mark it Failed.
+Time-to-acknowledge is measured from the message's creation timestamp and
+tracked per priority against SLA_SECONDS.
+
+Usage:
+    python message_dispatch.py --workers 4                  # serve pending messages
+    python message_dispatch.py --metrics-port 9101          # ... and serve /metrics (METRICS_ENABLED=1)
+    python message_dispatch.py --burst 5000 --handler-ms 5  # burst test, prints SLA report
+"""
+import argparse
+import itertools
+import queue
+import random
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import metrics
+
+PRIORITY_RANK = {'High': 0, 'Medium': 1, 'Low': 2}
+SLA_SECONDS = {'High': 5.0, 'Medium': 60.0, 'Low': 600.0}
+ACK_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0, 1800.0)
+MAX_ATTEMPTS = 3
+
+if metrics.ENABLED:
+    # Registered before the first observe() so the exported histogram covers the Low SLA
+    metrics.REGISTRY.histogram('comm_time_to_ack_seconds', 'Communication time to acknowledge', buckets=ACK_BUCKETS)
+
+def _created_monotonic(timestamp):
+    """Convert a message timestamp to the monotonic clock, or None if unusable"""
+    if timestamp is None:
+        return None
+    try:
+        created = timestamp if isinstance(timestamp, datetime) else datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return None
+    age = (datetime.now() - created).total_seconds()
+    if age < 0:
+        return None
+    return time.monotonic() - age
+
+class SLATracker:
+    """Time-to-acknowledge samples and SLA breaches per priority"""
+
+    def __init__(self, max_samples=100000):
+        self._lock = threading.Lock()
+        self._samples = {p: deque(maxlen=max_samples) for p in PRIORITY_RANK}
+        self._breaches = {p: 0 for p in PRIORITY_RANK}
+
+    def record(self, priority, seconds):
+        with self._lock:
+            self._samples.setdefault(priority, deque(maxlen=100000)).append(seconds)
+            if seconds > SLA_SECONDS.get(priority, float('inf')):
+                self._breaches[priority] = self._breaches.get(priority, 0) + 1
+        metrics.observe('comm_time_to_ack_seconds', seconds, 'Communication time to acknowledge', priority=priority)
+
+    def report(self):
+        rows = []
+        with self._lock:
+            samples = {p: sorted(values) for p, values in self._samples.items()}
+            breaches = dict(self._breaches)
+        for priority in sorted(samples, key=lambda p: PRIORITY_RANK.get(p, len(PRIORITY_RANK))):
+            values = samples[priority]
+            if not values:
+                continue
+
+            def pct(q):
+                return values[min(len(values) - 1, int(q * len(values)))]
+            rows.append({
+                'priority': priority,
+                'acknowledged': len(values),
+                'p50_s': pct(0.50),
+                'p95_s': pct(0.95),
+                'p99_s': pct(0.99),
+                'max_s': values[-1],
+                'sla_s': SLA_SECONDS.get(priority),
+                'breaches': breaches.get(priority, 0),
+                'within_sla_pct': 100.0 * (1 - breaches.get(priority, 0) / len(values))
+            })
+        return rows
+
+class MessageDispatcher:
+    """Worker threads draining a priority queue of pending messages.
+
+    store_factory returns an object with update_communication_status and
+    close (a Database); each worker gets its own so connections are never
+    shared between threads.
+    """
+
+    def __init__(self, store_factory, workers=4, handler=None):
+        self.store_factory = store_factory
+        self.workers = workers
+        self.handler = handler or (lambda message: None)
+        self.sla = SLATracker()
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+        self._attempts = {}  # message id -> failed attempts so far
+        self._threads = []
+        self._stop = threading.Event()
+
+    def submit(self, message):
+        """Queue a message dict with at least id and priority. Duplicates are ignored."""
+        return self._enqueue(message, _created_monotonic(message.get('timestamp')) or time.monotonic())
+
+    def _enqueue(self, message, created):
+        with self._queued_lock:
+            if message['id'] in self._queued:
+                return False
+            self._queued.add(message['id'])
+        rank = PRIORITY_RANK.get(message.get('priority'), len(PRIORITY_RANK))
+        self._queue.put((rank, created, next(self._seq), message))
+        metrics.inc('comm_dispatch_queued_total', 1, 'Messages queued for dispatch', priority=message.get('priority'))
+        return True
+
+    def submit_pending(self, db):
+        """Queue every pending message not already queued. Returns the number added."""
+        pending = db.get_pending_communications()
+        return sum(self.submit(message) for message in pending.to_dict('records'))
+
+    @property
+    def backlog(self):
+        return self._queue.qsize()
+
+    def start(self):
+        self._stop.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'dispatch-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, drain=True):
+        if drain:
+            self._queue.join()
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self):
+        store = self.store_factory()
+        try:
+            while not self._stop.is_set():
+                try:
+                    _, created, _, message = self._queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                retry = False
+                try:
+                    self._process(store, message, created)
+                except Exception as e:
+                    print(f"Dispatch of message {message['id']} failed: {e}", file=sys.stderr)
+                    metrics.inc('comm_dispatch_errors_total', 1, 'Failed message dispatches', priority=message.get('priority'))
+                    store = self._recover(store)
+                    try:
+                        retry = self._release(store, message)
+                    except Exception as release_error:
+                        print(f"Could not release message {message['id']}: {release_error}", file=sys.stderr)
+                        store = self._recover(store)
+                finally:
+                    with self._queued_lock:
+                        self._queued.discard(message['id'])
+                    if retry:
+                        # Requeue before task_done so stop(drain=True) waits for the retry
+                        self._enqueue(message, created)
+                    self._queue.task_done()
+        finally:
+            try:
+                store.close()
+            except Exception:
+                pass
+
+    def _process(self, store, message, created):
+        # Claim the message; another dispatcher may already have taken it
+        if not store.update_communication_status(message['id'], 'Received', expected_status='Pending'):
+            return
+        self.handler(message)
+        store.update_communication_status(message['id'], 'Acknowledged', expected_status='Received')
+        with self._queued_lock:
+            self._attempts.pop(message['id'], None)
+        self.sla.record(message.get('priority'), time.monotonic() - created)
+
+    def _recover(self, store):
+        """Roll back a failed transaction, or replace the store if its connection is gone"""
+        connection = getattr(store, 'connection', None)
+        if connection is None or getattr(store, 'using_fallback', False):
+            return store
+        if not connection.closed:
+            try:
+                connection.rollback()
+                # Outside a transaction rollback never reaches the server, so check the connection
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                connection.rollback()
+                return store
+            except Exception as e:
+                print(f"Rollback failed, reconnecting: {e}", file=sys.stderr)
+        try:
+            store.close()
+        except Exception:
+            pass
+        metrics.inc('comm_dispatch_reconnects_total', 1, 'Dispatch worker store reconnects')
+        return self.store_factory()
+
+    def _release(self, store, message):
+        """Return a claimed message whose handling failed to Pending, or mark it Failed.
+
+        Returns True if the message should be queued again.
+        """
+        with self._queued_lock:
+            attempts = self._attempts.pop(message['id'], 0) + 1
+            if attempts < MAX_ATTEMPTS:
+                self._attempts[message['id']] = attempts
+        status = 'Pending' if attempts < MAX_ATTEMPTS else 'Failed'
+        released = store.update_communication_status(message['id'], status, expected_status='Received')
+        metrics.inc('comm_dispatch_attempts_failed_total', 1, 'Failed handling attempts',
+                    priority=message.get('priority'), outcome='failed' if status == 'Failed' else 'retry')
+        return released and status == 'Pending'
+
+class MemoryStore:
+    """In-memory status store for burst tests without a database"""
+
+    def __init__(self, statuses, lock):
+        self.statuses = statuses
+        self.lock = lock
+
+    def update_communication_status(self, comm_id, status, expected_status=None):
+        with self.lock:
+            if expected_status is not None and self.statuses.get(comm_id) != expected_status:
+                return False
+            self.statuses[comm_id] = status
+            return True
+
+    def close(self):
+        pass
+
+def run_burst(count, workers, handler_ms, high_share=0.1, use_database=False, fallback_only=False):
+    """Submit a burst of Pending messages at once and dispatch them all"""
+    handler = (lambda message: time.sleep(handler_ms / 1000.0)) if handler_ms else None
+    priorities = random.choices(['High', 'Medium', 'Low'], weights=[high_share, (1 - high_share) / 2, (1 - high_share) / 2], k=count)
+
+    if use_database:
+        from database import Database
+
+        db = Database(fallback_only=fallback_only)
+        try:
+            for i, priority in enumerate(priorities):
+                db.log_communication({
+                    'message_type': 'Emergency Alert' if priority == 'High' else 'Status Update',
+                    'priority': priority,
+                    'message': f'Burst message {i}',
+                    'status': 'Pending'
+                })
+            dispatcher = MessageDispatcher(lambda: Database(fallback_only=fallback_only), workers, handler)
+            dispatcher.submit_pending(db)
+        finally:
+            db.close()
+    else:
+        statuses = {i: 'Pending' for i in range(count)}
+        lock = threading.Lock()
+        dispatcher = MessageDispatcher(lambda: MemoryStore(statuses, lock), workers, handler)
+        for i, priority in enumerate(priorities):
+            dispatcher.submit({'id': i, 'priority': priority})
+
+    start = time.monotonic()
+    dispatcher.start()
+    dispatcher.stop(drain=True)
+    print(f"Dispatched {count} messages with {workers} workers in {time.monotonic() - start:.2f}s")
+    return dispatcher.sla.report()
+
+def serve(workers, poll_interval, handler_ms, metrics_port=None):
+    """Dispatch pending messages until interrupted, woken by the change feed or polling"""
+    import change_feed
+    from database import Database
+
+    if metrics_port:
+        if metrics.ENABLED:
+            metrics.start_http_server(metrics_port)
+        else:
+            print("--metrics-port ignored: set METRICS_ENABLED=1 to collect metrics", file=sys.stderr)
+    handler = (lambda message: time.sleep(handler_ms / 1000.0)) if handler_ms else None
+    dispatcher = MessageDispatcher(Database, workers, handler)
+    dispatcher.start()
+    wake = threading.Event()
+
+    def on_change(event):
+        # New messages or a resync. Status updates, including this dispatcher's
+        # own, need no rescan; the file watcher cannot tell inserts apart.
+        if event['op'] in ('INSERT', 'RESYNC') or event['source'] == 'file':
+            wake.set()
+    change_feed.FEED.subscribe('communications', on_change)
+    db = Database()
+    try:
+        change_feed.FEED.start(db)
+        while True:
+            added = dispatcher.submit_pending(db)
+            if added:
+                print(f"Queued {added} pending messages (backlog {dispatcher.backlog})")
+            wake.wait(poll_interval)
+            wake.clear()
+    except KeyboardInterrupt:
+        print("Stopping dispatcher")
+    finally:
+        db.close()
+        dispatcher.stop(drain=False)
+        print_report(dispatcher.sla.report())
+
+def print_report(rows):
+    print(f"{'priority':<8} {'acked':>7} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'max s':>8} {'SLA s':>7} {'breaches':>9} {'in SLA':>7}")
+    for r in rows:
+        print(f"{r['priority']:<8} {r['acknowledged']:>7} {r['p50_s']:>8.3f} {r['p95_s']:>8.3f} {r['p99_s']:>8.3f} "
+              f"{r['max_s']:>8.3f} {r['sla_s']:>7.0f} {r['breaches']:>9} {r['within_sla_pct']:>6.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Dispatch pending communications by priority")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--handler-ms', type=float, default=0, help="Simulated handling time per message")
+    parser.add_argument('--poll-interval', type=float, default=5.0, help="Seconds between pending scans when idle")
+    parser.add_argument('--burst', type=int, metavar='MESSAGES', help="Run a burst test instead of serving")
+    parser.add_argument('--high-share', type=float, default=0.1, help="Fraction of High messages in the burst")
+    parser.add_argument('--use-database', action='store_true', help="Burst through the database instead of memory")
+    parser.add_argument('--fallback', action='store_true', help="Use the file-based fallback store")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port while serving")
+    args = parser.parse_args()
+
+    if args.burst:
+        report = run_burst(args.burst, args.workers, args.handler_ms, args.high_share,
+                           args.use_database, args.fallback)
+        print_report(report)
+        high = next((r for r in report if r['priority'] == 'High'), None)
+        sys.exit(1 if high and high['breaches'] else 0)
+    serve(args.workers, args.poll_interval, args.handler_ms, args.metrics_port)
+
+if __name__ == "__main__":
+    main()
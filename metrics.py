@@ -0,0 +1,282 @@
+"""Lightweight in-process instrumentation: counters, histograms and timers.
+
+Metrics are off unless METRICS_ENABLED=1. When disabled, @timed returns the
+wrapped function untouched and timer()/inc()/observe() return immediately, so
+instrumented hot paths cost next to nothing.
+
+Collected metrics are rendered in the Prometheus text exposition format by
+render_prometheus(), served over HTTP by start_http_server() and shown on the
+admin Metrics page.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.getenv('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text=''):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, (), value
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text='', buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self, **labels):
+        """Return (buckets, counts, sum, count) for one label set"""
+        with self._lock:
+            state = list(self._values.get(_label_key(labels), [0] * (len(self.buckets) + 2)))
+        return self.buckets, state[:-2], state[-2], state[-1]
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile by linear interpolation within buckets"""
+        buckets, counts, _, total = self.snapshot(**labels)
+        if total == 0:
+            return None
+        rank = q * total
+        lower_bound, lower_count = 0.0, 0
+        for bound, count in zip(buckets, counts):
+            if count >= rank:
+                if count == lower_count:
+                    return bound
+                return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+            lower_bound, lower_count = bound, count
+        return buckets[-1]
+
+    def label_sets(self):
+        with self._lock:
+            return [dict(key) for key in self._values]
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            for bound, count in zip(self.buckets, state[:-2]):
+                yield f'{self.name}_bucket', key, (('le', _format_value(float(bound))),), count
+            yield f'{self.name}_bucket', key, (('le', '+Inf'),), state[-1]
+            yield f'{self.name}_sum', key, (), state[-2]
+            yield f'{self.name}_count', key, (), state[-1]
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = cls(name, help_text, **kwargs)
+                    self._metrics[name] = metric
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name, help_text=''):
+        return self._get_or_create(Counter, name, help_text)
+
+    def histogram(self, name, help_text='', buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def render(self):
+        lines = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            if metric.help_text:
+                lines.append(f'# HELP {name} {metric.help_text}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(key, extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+def inc(name, amount=1, help_text='', **labels):
+    if not ENABLED:
+        return
+    REGISTRY.counter(name, help_text).inc(amount, **labels)
+
+def observe(name, value, help_text='', **labels):
+    if not ENABLED:
+        return
+    REGISTRY.histogram(name, help_text).observe(value, **labels)
+
+@contextmanager
+def timer(name, help_text='', **labels):
+    """Record the duration of the with-block, in seconds, into a histogram"""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.histogram(name, help_text).observe(time.perf_counter() - start, **labels)
+
+def timed(name, help_text='', **labels):
+    """Decorator recording call durations into a histogram labelled by function.
+
+    Resolved at decoration time: with metrics disabled the function is
+    returned unwrapped.
+    """
+    def decorator(func):
+        if not ENABLED:
+            return func
+        histogram = REGISTRY.histogram(name, help_text)
+        call_labels = dict(labels, function=func.__qualname__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **call_labels)
+        return wrapper
+    return decorator
+
+def record_query(statement, seconds, rows, target='primary'):
+    """Record one SQL statement's latency and row count"""
+    if not ENABLED:
+        return
+    REGISTRY.histogram('db_query_seconds', 'SQL statement latency').observe(seconds, statement=statement, target=target)
+    REGISTRY.counter('db_query_total', 'SQL statements executed').inc(statement=statement, target=target)
+    if rows is not None and rows >= 0:
+        REGISTRY.counter('db_query_rows_total', 'Rows returned or affected by SQL statements').inc(
+            rows, statement=statement, target=target)
+
+def render_prometheus():
+    return REGISTRY.render()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_http_server(port, addr='0.0.0.0'):
+    """Serve /metrics from a daemon thread. Safe to call on every rerun."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+        except OSError as e:
+            print(f"Metrics endpoint error: {e}")
+            return None
+        thread = threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True)
+        thread.start()
+        return _server
+
+def render_metrics_page():
+    import streamlit as st
+
+    st.title("Metrics")
+    if not ENABLED:
+        st.info("Instrumentation is disabled. Set METRICS_ENABLED=1 and restart to collect metrics.")
+        return
+
+    query_histogram = REGISTRY.get('db_query_seconds')
+    if query_histogram is not None:
+        st.subheader("SQL Statements")
+        rows = []
+        row_counter = REGISTRY.get('db_query_rows_total')
+        for labels in query_histogram.label_sets():
+            _, _, total, count = query_histogram.snapshot(**labels)
+            rows.append({
+                'statement': labels['statement'],
+                'target': labels.get('target', 'primary'),
+                'calls': count,
+                'mean_ms': total / count * 1000 if count else 0,
+                'p95_ms': (query_histogram.quantile(0.95, **labels) or 0) * 1000,
+                'rows': row_counter.value(**labels) if row_counter else 0
+            })
+        st.dataframe(sorted(rows, key=lambda r: r['mean_ms'] * r['calls'], reverse=True),
+                     use_container_width=True)
+
+    st.subheader("Prometheus Exposition")
+    st.code(render_prometheus(), language='text')
@@ -0,0 +1,27 @@
+"""One-off schema migrations that are too heavy to run from a web request.
+
+create_tables only sets up what is cheap: new tables and indexes on tables
+that do not exist yet. Run this once per database after deploying a version
+that needs it, ideally outside peak hours:
+
+Usage:
+    python migrate.py
+"""
+import argparse
+
+from database import Database
+
+def main():
+    argparse.ArgumentParser(description="Apply one-off schema migrations to PostgreSQL").parse_args()
+
+    db = Database(use_replicas=False)
+    try:
+        if db.using_fallback:
+            raise SystemExit("PostgreSQL is not reachable; the file-based store needs no migration")
+        db.migrate_communications_search()
+        print("Communications search is migrated")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
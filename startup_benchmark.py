@@ -0,0 +1,121 @@
+"""Startup benchmark: per-module import times and time-to-first-render.
+
+Usage:
+    python startup_benchmark.py
+    python startup_benchmark.py --modules main auth database --top 10
+    python startup_benchmark.py --render --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_MODULES = [
+    'main', 'auth', 'database', 'inventory', 'communications',
+    'export_utils', 'dashboard_viz', 'data_generator'
+]
+
+def parse_importtime(stderr):
+    """Parse `python -X importtime` output into a list of dicts"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            # Header line
+            continue
+        entries.append({
+            'module': parts[2].strip(),
+            'self_ms': self_us / 1000,
+            'cumulative_ms': cumulative_us / 1000
+        })
+    return entries
+
+def measure_import(module_name, repeat=3):
+    """Import a module in fresh interpreters and return the fastest run"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+            cwd=here, capture_output=True, text=True
+        )
+        wall_ms = (time.perf_counter() - start) * 1000
+        if proc.returncode != 0:
+            return {
+                'module': module_name,
+                'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import failed'
+            }
+        entries = parse_importtime(proc.stderr)
+        target = next((e for e in reversed(entries) if e['module'] == module_name), None)
+        result = {
+            'module': module_name,
+            'wall_ms': wall_ms,
+            'cumulative_ms': target['cumulative_ms'] if target else None,
+            'entries': entries
+        }
+        if best is None or wall_ms < best['wall_ms']:
+            best = result
+    return best
+
+def measure_first_render(script='main.py', timeout=60):
+    """Time the first script run of the app using Streamlit's AppTest harness"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {'error': 'streamlit.testing is not available'}
+    start = time.perf_counter()
+    app = AppTest.from_file(script, default_timeout=timeout)
+    app.run()
+    return {
+        'script': script,
+        'first_render_ms': (time.perf_counter() - start) * 1000,
+        'exceptions': [str(e.value) for e in app.exception]
+    }
+
+def print_report(results, top):
+    for result in results:
+        if 'error' in result:
+            print(f"{result['module']}: ERROR {result['error']}")
+            continue
+        print(f"\n{result['module']}: wall {result['wall_ms']:.1f} ms, "
+              f"import {result['cumulative_ms'] or 0:.1f} ms")
+        heaviest = sorted(result['entries'], key=lambda e: e['self_ms'], reverse=True)[:top]
+        for entry in heaviest:
+            print(f"    {entry['self_ms']:8.1f} ms self  {entry['cumulative_ms']:8.1f} ms cum  {entry['module']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure application import and first-render time")
+    parser.add_argument('--modules', nargs='+', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help="Heaviest modules to show per import")
+    parser.add_argument('--render', action='store_true', help="Also measure time to first render of main.py")
+    parser.add_argument('--output', help="Write the full report to this JSON file")
+    args = parser.parse_args()
+
+    results = [measure_import(name, args.repeat) for name in args.modules]
+    print_report(results, args.top)
+
+    report = {'python': sys.version.split()[0], 'imports': results}
+    if args.render:
+        report['first_render'] = measure_first_render()
+        if 'error' in report['first_render']:
+            print(f"\nFirst render: ERROR {report['first_render']['error']}")
+        else:
+            print(f"\nFirst render: {report['first_render']['first_render_ms']:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
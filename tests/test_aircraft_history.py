@@ -0,0 +1,42 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import track_checkpoint
+from database import Database
+
+START = datetime.now().replace(microsecond=0) - timedelta(hours=3)
+
+def position(aircraft_id, latitude):
+    return {'aircraft_id': aircraft_id, 'type': 'F-16', 'latitude': latitude, 'longitude': 2.0,
+            'altitude': 1000.0, 'speed': 300.0, 'heading': 90.0}
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # Prune only when a test asks for it
+    monkeypatch.setattr(Database, '_history_pruned_at', time.monotonic())
+    db = Database(fallback_only=True, data_dir=str(tmp_path))
+    for minute in range(180):
+        recorded_at = (START + timedelta(minutes=minute)).isoformat()
+        db._append_fallback_history([position('AC1', float(minute)), position('AC2', -float(minute))], recorded_at)
+    return db
+
+def test_history_window_is_read_from_the_middle_of_the_log(db):
+    history = db.get_aircraft_history(START + timedelta(minutes=60), START + timedelta(minutes=69))
+
+    assert len(history) == 20
+    assert history['recorded_at'].min() == START + timedelta(minutes=60)
+    assert history['recorded_at'].max() == START + timedelta(minutes=69)
+    assert history[history['aircraft_id'] == 'AC1']['latitude'].tolist() == [float(m) for m in range(60, 70)]
+
+def test_prune_compacts_the_log_and_invalidates_checkpoint_replay(db, tmp_path):
+    track_checkpoint.write_checkpoint(db, str(tmp_path / 'checkpoints'))
+    removed = db.prune_aircraft_history(START + timedelta(minutes=120))
+
+    assert removed == 240
+    history = db.get_aircraft_history(START)
+    assert len(history) == 120
+    assert history['recorded_at'].min() == START + timedelta(minutes=120)
+    assert db.prune_aircraft_history(START + timedelta(minutes=120)) == 0
+    assert track_checkpoint.load_track_picture(db, str(tmp_path / 'checkpoints')) is None
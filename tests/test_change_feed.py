@@ -0,0 +1,35 @@
+import time
+from types import SimpleNamespace
+
+import change_feed
+from database import Database
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+def test_listener_follows_the_backend_of_the_latest_db(tmp_path):
+    feed = change_feed.ChangeFeed()
+    try:
+        assert feed.start(Database(fallback_only=True, data_dir=str(tmp_path / 'a')))
+        version = feed.version('inventory')
+        assert feed.start(Database(fallback_only=True, data_dir=str(tmp_path / 'b')))
+        assert feed._backend == ('fallback', str(tmp_path / 'b'))
+        # Results cached from the previous store are invalidated
+        assert feed.version('inventory') == version + 1
+    finally:
+        feed.stop()
+
+def test_watcher_exits_once_postgres_is_reachable_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_feed, 'PRIMARY_PROBE_INTERVAL', 0.0)
+    db = SimpleNamespace(using_fallback=True, data_dir=str(tmp_path), primary_unavailable=True,
+                         connect_primary=lambda: SimpleNamespace(close=lambda: None))
+    feed = change_feed.ChangeFeed()
+    try:
+        assert feed.start(db)
+        assert wait_for(lambda: not feed.listening)
+        assert feed.version('aircraft') == 1
+    finally:
+        feed.stop()
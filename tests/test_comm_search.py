@@ -0,0 +1,27 @@
+import comm_search
+
+def messages():
+    return [
+        {'id': 1, 'message_type': 'Alert', 'message': 'Engine failure on approach', 'status': 'Pending'},
+        {'id': 2, 'message_type': 'Status', 'message': 'Both engines running normally', 'status': 'Pending'},
+        {'id': 3, 'message_type': 'Weather', 'message': 'Storm reported near the runway', 'status': 'Pending'},
+    ]
+
+def index():
+    index = comm_search.InvertedIndex()
+    index.refresh(messages(), mtime=0)
+    return index
+
+def ids(results):
+    return [record['id'] for _, record in results]
+
+def test_inflected_forms_match():
+    assert sorted(ids(index().search('engines'))) == [1, 2]
+    assert ids(index().search('reports storm')) == [3]
+
+def test_exclusions():
+    assert ids(index().search('engine -running')) == [1]
+    # Like websearch_to_tsquery('-engine'): every message without the term
+    assert ids(index().search('-engine')) == [3]
+    assert ids(index().search('-alert')) == [3, 2]
+    assert index().search('') == []
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pandas as pd
+
+import fleet_analytics
+
+def small_history():
+    history = pd.DataFrame({
+        'aircraft_id': ['A1', 'A1', 'B1'],
+        'latitude': [1.0, 2.0, 3.0],
+        'longitude': [1.0, 2.0, 3.0],
+        'altitude': [100.0, 200.0, 300.0],
+        'speed': [10.0, 20.0, 30.0],
+        'heading': [0.0, 90.0, 180.0],
+        'recorded_at': ['2026-01-01T00:00:00', '2026-01-01T00:01:00', '2026-01-01T00:06:00']
+    })
+    aircraft = pd.DataFrame({'aircraft_id': ['A1', 'B1'], 'type': ['F-16', 'C-130']})
+    return history, aircraft
+
+def test_compute_analytics_on_small_history():
+    history, aircraft = small_history()
+    analytics = fleet_analytics.compute_analytics(history, aircraft, datetime(2026, 1, 1), datetime(2026, 1, 2))
+
+    assert analytics.points == 3
+    by_type = analytics.by_type.set_index('type')
+    assert by_type.loc['F-16', 'points'] == 2
+    assert by_type.loc['F-16', 'aircraft'] == 1
+    assert by_type.loc['F-16', 'speed_mean'] == 15.0
+    assert by_type.loc['F-16', 'speed_p50'] == 15.0
+    assert by_type.loc['C-130', 'altitude_p90'] == 300.0
+    assert analytics.by_region['points'].sum() == 3
+
+    # Each point lies in its own 1-degree cell, including the maximum
+    density = analytics.density.sort_values('latitude')
+    assert density['latitude'].tolist() == [1.5, 2.5, 3.5]
+    assert density['count'].tolist() == [1, 1, 1]
+
+    activity = analytics.activity.set_index(['bucket', 'type'])['updates']
+    assert activity[(pd.Timestamp('2026-01-01 00:00'), 'F-16')] == 2
+    assert activity[(pd.Timestamp('2026-01-01 00:05'), 'C-130')] == 1
+
+def test_compute_analytics_on_empty_history():
+    history, aircraft = small_history()
+    analytics = fleet_analytics.compute_analytics(history.iloc[0:0], aircraft, datetime(2026, 1, 1), datetime(2026, 1, 2))
+
+    assert analytics.points == 0
+    assert analytics.by_type.empty
+    assert analytics.density.empty
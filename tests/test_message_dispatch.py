@@ -0,0 +1,54 @@
+import threading
+
+import message_dispatch
+from message_dispatch import MemoryStore, MessageDispatcher
+
+class BrokenConnection:
+    closed = 2
+
+class BrokenStore:
+    """A Database whose connection was dropped"""
+    using_fallback = False
+    connection = BrokenConnection()
+
+    def update_communication_status(self, comm_id, status, expected_status=None):
+        raise RuntimeError("connection already closed")
+
+    def close(self):
+        raise RuntimeError("connection already closed")
+
+def test_failed_handling_is_retried_then_marked_failed():
+    statuses = {1: 'Pending', 2: 'Pending'}
+    lock = threading.Lock()
+    calls = []
+
+    def handler(message):
+        calls.append(message['id'])
+        if message['id'] == 2 or calls.count(1) < 2:
+            raise RuntimeError("handler failed")
+    dispatcher = MessageDispatcher(lambda: MemoryStore(statuses, lock), 1, handler)
+    dispatcher.submit({'id': 1, 'priority': 'High'})
+    dispatcher.submit({'id': 2, 'priority': 'Low'})
+    dispatcher.start()
+    dispatcher.stop(drain=True)
+
+    assert statuses == {1: 'Acknowledged', 2: 'Failed'}
+    assert calls.count(1) == 2
+    assert calls.count(2) == message_dispatch.MAX_ATTEMPTS
+
+def test_worker_replaces_a_store_whose_connection_is_gone():
+    statuses = {1: 'Pending', 2: 'Pending'}
+    lock = threading.Lock()
+    stores = [BrokenStore()]
+
+    def store_factory():
+        return stores.pop() if stores else MemoryStore(statuses, lock)
+    dispatcher = MessageDispatcher(store_factory, 1)
+    dispatcher.submit({'id': 1, 'priority': 'High'})
+    dispatcher.submit({'id': 2, 'priority': 'Low'})
+    dispatcher.start()
+    dispatcher.stop(drain=True)
+
+    # The claim of 1 failed on the dead connection, so it is still Pending for the next
+    # scan; the worker carried on with a new store
+    assert statuses == {1: 'Pending', 2: 'Acknowledged'}
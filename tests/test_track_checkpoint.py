@@ -0,0 +1,54 @@
+import pandas as pd
+
+import track_checkpoint
+from database import Database
+
+def aircraft(aircraft_id, latitude, aircraft_type='F-16'):
+    return {'aircraft_id': aircraft_id, 'type': aircraft_type, 'latitude': latitude, 'longitude': 2.0,
+            'altitude': 1000.0, 'speed': 300.0, 'heading': 90.0}
+
+class PostgresLikeStore:
+    """Just enough of Database for the Postgres replay path"""
+    using_fallback = False
+
+    def __init__(self, rows):
+        self.rows = pd.DataFrame(rows)
+
+    def get_all_aircraft(self):
+        return self.rows
+
+    def get_aircraft_since(self, since):
+        return self.rows[pd.to_datetime(self.rows['last_update']) >= since]
+
+def test_fallback_checkpoint_replays_later_updates(tmp_path):
+    db = Database(fallback_only=True, data_dir=str(tmp_path / 'data'))
+    for i in range(3):
+        db.insert_aircraft(aircraft(f'AC{i}', float(i)))
+    manifest = track_checkpoint.write_checkpoint(db, str(tmp_path / 'checkpoints'))
+    assert manifest['rows'] == 3
+
+    db.insert_aircraft(aircraft('AC1', 50.0))
+    db.insert_aircraft(aircraft('AC9', 9.0, 'C-130'))
+
+    picture = track_checkpoint.load_track_picture(db, str(tmp_path / 'checkpoints'))
+    assert len(picture) == 4
+    frame = picture.to_frame().set_index('aircraft_id').sort_index()
+    expected = db.get_all_aircraft().set_index('aircraft_id').sort_index()
+    assert frame['latitude'].tolist() == expected['latitude'].tolist()
+    assert frame.loc['AC9', 'type'] == 'C-130'
+
+def test_checkpoint_from_other_store_is_ignored(tmp_path):
+    db = Database(fallback_only=True, data_dir=str(tmp_path / 'data'))
+    db.insert_aircraft(aircraft('AC1', 1.0))
+    track_checkpoint.write_checkpoint(db, str(tmp_path / 'checkpoints'))
+
+    other = Database(fallback_only=True, data_dir=str(tmp_path / 'other'))
+    assert track_checkpoint.load_track_picture(other, str(tmp_path / 'checkpoints')) is None
+
+def test_empty_postgres_checkpoint_falls_back_to_full_read(tmp_path):
+    empty = PostgresLikeStore({'aircraft_id': [], 'type': [], 'latitude': [], 'longitude': [], 'altitude': [],
+                               'speed': [], 'heading': [], 'last_update': []})
+    track_checkpoint.write_checkpoint(empty, str(tmp_path))
+
+    store = PostgresLikeStore([dict(aircraft('AC1', 1.0), last_update='2026-01-01T00:00:00')])
+    assert track_checkpoint.load_track_picture(store, str(tmp_path)) is None
@@ -0,0 +1,264 @@
+"""Memory-mapped checkpoints of the current track picture.
+
+A checkpoint is a NumPy structured array with one fixed-width record per
+aircraft, sorted by aircraft_id and saved as .npy, plus a small JSON
+manifest that records the replay watermark. A loader memory-maps the array
+instead of parsing the table row by row, and reads from the store only the
+changes made since the watermark:
+- Postgres: aircraft rows with last_update >= watermark - REPLAY_SLACK_SECONDS.
+  The slack covers transactions that started before the checkpoint but
+  committed after it.
+- Fallback store: the aircraft_history.jsonl log from the position that
+  was recorded before the checkpoint read. If retention has compacted the
+  log since, the checkpoint is not used.
+
+Usage:
+    python track_checkpoint.py --interval 30     # checkpoint every 30 seconds
+    python track_checkpoint.py --once
+"""
+import argparse
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+CHECKPOINT_DIR = os.getenv('TRACK_CHECKPOINT_DIR',
+                           os.path.join(tempfile.gettempdir(), 'aerospace_defense_checkpoints'))
+MANIFEST = 'checkpoint.json'
+REPLAY_SLACK_SECONDS = 60
+FORMAT_VERSION = 2
+
+TRACK_DTYPE = np.dtype([
+    ('aircraft_id', 'S10'),
+    ('type', 'S50'),
+    ('latitude', 'f8'),
+    ('longitude', 'f8'),
+    ('altitude', 'f8'),
+    ('speed', 'f8'),
+    ('heading', 'f8'),
+    ('last_update', 'datetime64[us]'),
+])
+COLUMNS = list(TRACK_DTYPE.names)
+TEXT_FIELDS = ('aircraft_id', 'type')
+
+def _source(db):
+    """Identify the store a checkpoint was taken from"""
+    if db.using_fallback:
+        return f"fallback:{os.path.abspath(db.data_dir)}"
+    return f"postgres:{os.getenv('PGHOST')}:{os.getenv('PGPORT')}/{os.getenv('PGDATABASE')}"
+
+def _encode(values, width):
+    return np.array([str(v).encode('utf-8')[:width] if v is not None else b'' for v in values], dtype=f'S{width}')
+
+def frame_to_array(frame):
+    """Convert aircraft rows to a TRACK_DTYPE array sorted by aircraft_id"""
+    array = np.zeros(len(frame), dtype=TRACK_DTYPE)
+    if len(frame) == 0:
+        return array
+    array['aircraft_id'] = _encode(frame['aircraft_id'], TRACK_DTYPE['aircraft_id'].itemsize)
+    array['type'] = _encode(frame['type'].where(frame['type'].notna(), None), TRACK_DTYPE['type'].itemsize)
+    for field in ('latitude', 'longitude', 'altitude', 'speed', 'heading'):
+        array[field] = pd.to_numeric(frame[field], errors='coerce').to_numpy(dtype='f8')
+    if 'last_update' in frame:
+        array['last_update'] = pd.to_datetime(frame['last_update']).to_numpy(dtype='datetime64[us]')
+    else:
+        array['last_update'] = np.datetime64('NaT')
+    return np.sort(array, order='aircraft_id')
+
+def array_to_frame(array):
+    frame = pd.DataFrame({field: array[field] for field in COLUMNS})
+    for field in TEXT_FIELDS:
+        frame[field] = np.char.decode(array[field], 'utf-8')
+    return frame
+
+@metrics.timed('checkpoint_write_seconds', 'Track checkpoint write latency')
+def write_checkpoint(db, directory=None):
+    """Write the current track picture and atomically publish it. Returns the manifest."""
+    directory = directory or CHECKPOINT_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    # Record the log position before reading, so replay covers every later write
+    log_position = db.aircraft_history_log_position() if db.using_fallback else None
+    array = frame_to_array(db.get_all_aircraft())
+
+    generation = time.time_ns()
+    data_name = f'tracks-{generation}.npy'
+    tmp_path = os.path.join(directory, f'.{data_name}.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, os.path.join(directory, data_name))
+
+    watermark = array['last_update'].max() if len(array) else np.datetime64('NaT')
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'source': _source(db),
+        'data_file': data_name,
+        'rows': int(len(array)),
+        'watermark': None if np.isnat(watermark) else str(watermark),
+        'log_position': log_position,
+        'written_at': time.time()
+    }
+    tmp_manifest = os.path.join(directory, f'.{MANIFEST}.tmp')
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, os.path.join(directory, MANIFEST))
+
+    # Older generations may still be mapped by running readers; unlinking is safe on POSIX
+    for old in glob.glob(os.path.join(directory, 'tracks-*.npy')):
+        if os.path.basename(old) != data_name:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+    metrics.inc('checkpoint_rows_total', len(array), 'Aircraft rows checkpointed')
+    return manifest
+
+def load_checkpoint(directory=None):
+    """Memory-map the latest checkpoint. Returns (array, manifest) or (None, None)."""
+    directory = directory or CHECKPOINT_DIR
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != FORMAT_VERSION:
+            return None, None
+        array = np.load(os.path.join(directory, manifest['data_file']), mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None, None
+    if array.dtype != TRACK_DTYPE:
+        return None, None
+    return array, manifest
+
+class TrackPicture:
+    """Checkpointed aircraft (memory-mapped, read-only) overlaid with later updates"""
+
+    def __init__(self, base, updates):
+        self.base = base
+        # Latest replayed update per aircraft, keyed by aircraft_id
+        self.updates = updates
+
+    def __len__(self):
+        return len(self.base) + sum(1 for aircraft_id in self.updates if self._base_index(aircraft_id) is None)
+
+    def _base_index(self, aircraft_id):
+        key = str(aircraft_id).encode('utf-8')
+        index = int(np.searchsorted(self.base['aircraft_id'], key))
+        if index < len(self.base) and self.base['aircraft_id'][index] == key:
+            return index
+        return None
+
+    def to_frame(self):
+        """Decode the checkpoint into a DataFrame (a full copy) and apply the updates"""
+        frame = array_to_frame(self.base)
+        if not self.updates:
+            return frame
+        overlay = pd.DataFrame(list(self.updates.values()))
+        overlay['last_update'] = pd.to_datetime(overlay.get('last_update'))
+        frame = frame[~frame['aircraft_id'].isin(overlay['aircraft_id'])]
+        return pd.concat([frame, overlay[COLUMNS]], ignore_index=True)
+
+@metrics.timed('checkpoint_load_seconds', 'Track picture warm-start latency')
+def load_track_picture(db, directory=None):
+    """Warm-start the track picture from the checkpoint plus changes since its watermark.
+
+    Returns None when there is no usable checkpoint for db's store.
+    """
+    base, manifest = load_checkpoint(directory)
+    if base is None or manifest.get('source') != _source(db):
+        return None
+
+    updates = {}
+    if db.using_fallback:
+        records = db.read_aircraft_history_log(manifest['log_position'])
+        if records is None:
+            # The history log was compacted or replaced since the checkpoint
+            return None
+        for record in records:
+            previous = updates.get(record['aircraft_id'])
+            if record.get('type') is None and previous is None:
+                # Older log lines carry no type; keep the checkpointed one
+                index = TrackPicture(base, {})._base_index(record['aircraft_id'])
+                if index is not None:
+                    record['type'] = base['type'][index].decode('utf-8')
+            elif record.get('type') is None:
+                record['type'] = previous['type']
+            record['last_update'] = record.pop('recorded_at')
+            updates[record['aircraft_id']] = {field: record.get(field) for field in COLUMNS}
+    elif manifest['watermark'] is not None:
+        since = pd.Timestamp(manifest['watermark']).to_pydatetime() - timedelta(seconds=REPLAY_SLACK_SECONDS)
+        for record in db.get_aircraft_since(since).to_dict('records'):
+            updates[record['aircraft_id']] = record
+    else:
+        # Checkpoint of an empty table: there is no point to replay from
+        return None
+    metrics.inc('checkpoint_replayed_total', len(updates), 'Aircraft updates replayed after a checkpoint')
+    return TrackPicture(base, updates)
+
+def load_aircraft(db):
+    """Current aircraft frame: checkpoint plus replay when available, else a full read"""
+    picture = load_track_picture(db)
+    if picture is None:
+        return db.get_all_aircraft()
+    return picture.to_frame()
+
+class CheckpointWriter(threading.Thread):
+    """Writes a checkpoint every `interval` seconds until stopped"""
+
+    def __init__(self, db_factory, interval, directory=None):
+        super().__init__(name='track-checkpoint', daemon=True)
+        self.db_factory = db_factory
+        self.interval = interval
+        self.directory = directory
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        db = self.db_factory()
+        try:
+            return write_checkpoint(db, self.directory)
+        except Exception as e:
+            print(f"Track checkpoint failed: {e}")
+        finally:
+            db.close()
+
+    def stop(self, final_checkpoint=True):
+        self._stop_event.set()
+        self.join()
+        if final_checkpoint:
+            self.checkpoint()
+
+def main():
+    parser = argparse.ArgumentParser(description="Write memory-mapped track checkpoints")
+    parser.add_argument('--interval', type=float, default=30.0, help="Seconds between checkpoints")
+    parser.add_argument('--dir', default=CHECKPOINT_DIR)
+    parser.add_argument('--once', action='store_true', help="Write one checkpoint and exit")
+    parser.add_argument('--fallback', action='store_true', help="Use the file-based fallback store")
+    args = parser.parse_args()
+
+    from database import Database
+
+    writer = CheckpointWriter(lambda: Database(fallback_only=args.fallback), args.interval, args.dir)
+    if args.once:
+        manifest = writer.checkpoint()
+        if manifest:
+            print(f"Checkpointed {manifest['rows']} aircraft to {args.dir}")
+        return
+    writer.start()
+    try:
+        while writer.is_alive():
+            writer.join(1.0)
+    except KeyboardInterrupt:
+        writer.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Track trails and replay over stored position history.
+
+Trails are downsampled on the server before anything is sent to the map:
+Douglas-Peucker drops points that would not move the drawn line by more than
+a couple of pixels at the current zoom, and time-bucket decimation keeps at
+most one point per aircraft per bucket. Replay frames (the position of every
+aircraft at each frame time) are precomputed with a single as-of merge and
+cached per time window, so scrubbing the replay never queries the database.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+DEFAULT_WINDOW_SECONDS = 3600
+DEFAULT_FRAME_SECONDS = 30
+
+def tolerance_for_zoom(zoom, pixels=2.0):
+    """Degrees covered by `pixels` screen pixels at a web-mercator zoom level"""
+    return 360.0 / (256 * 2 ** zoom) * pixels
+
+def douglas_peucker(points, tolerance):
+    """Return a boolean mask of the points kept by Douglas-Peucker simplification.
+
+    points is an (n, 2) array of (longitude, latitude).
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n <= 2:
+        keep[:] = True
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a = points[start]
+        direction = points[end] - a
+        inner = points[start + 1:end] - a
+        length = np.hypot(direction[0], direction[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(direction[0] * inner[:, 1] - direction[1] * inner[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+def simplify_trails(history, tolerance):
+    """Douglas-Peucker each aircraft's trail. history must be sorted by aircraft then time."""
+    if history.empty:
+        return history
+    points = history[['longitude', 'latitude']].to_numpy(dtype=float)
+    ids = history['aircraft_id'].to_numpy()
+    # Trail boundaries: positions where aircraft_id changes
+    bounds = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(ids)]))
+    keep = np.zeros(len(points), dtype=bool)
+    for start, end in zip(starts, ends):
+        keep[start:end] = douglas_peucker(points[start:end], tolerance)
+    return history[keep]
+
+def decimate_by_time(history, bucket_seconds):
+    """Keep the last point per aircraft per time bucket"""
+    if history.empty:
+        return history
+    buckets = history['recorded_at'].dt.floor(f'{int(bucket_seconds)}s')
+    last = ~pd.DataFrame({'id': history['aircraft_id'], 'bucket': buckets}).duplicated(keep='last')
+    return history[last.to_numpy()]
+
+def downsample_trails(history, zoom, method='douglas-peucker', bucket_seconds=DEFAULT_FRAME_SECONDS):
+    if method == 'time-bucket':
+        return decimate_by_time(history, bucket_seconds)
+    return simplify_trails(history, tolerance_for_zoom(zoom))
+
+class Replay:
+    """Precomputed replay frames and downsampled trails for one time window"""
+
+    def __init__(self, start, end, frame_seconds, trails, positions):
+        self.start = start
+        self.end = end
+        self.frame_seconds = frame_seconds
+        self.trails = trails
+        self.frame_times = pd.date_range(start, end, freq=f'{int(frame_seconds)}s')
+        # frame index -> rows of positions at that frame
+        self._frames = {frame: group for frame, group in positions.groupby('frame', sort=True)}
+
+    def __len__(self):
+        return len(self.frame_times)
+
+    def frame(self, index):
+        """Latest known position of every aircraft as of frame `index`"""
+        return self._frames.get(index, pd.DataFrame(columns=['aircraft_id', 'latitude', 'longitude']))
+
+    def trails_until(self, index, trail_seconds=None):
+        """Trail points recorded up to frame `index`, optionally only the last trail_seconds"""
+        until = self.frame_times[index]
+        mask = self.trails['recorded_at'] <= until
+        if trail_seconds is not None:
+            mask &= self.trails['recorded_at'] >= until - pd.Timedelta(seconds=trail_seconds)
+        return self.trails[mask]
+
+@metrics.timed('replay_build_seconds', 'Replay precomputation latency')
+def build_replay(history, start, end, zoom, frame_seconds=DEFAULT_FRAME_SECONDS, method='douglas-peucker'):
+    trails = downsample_trails(history, zoom, method, frame_seconds)
+    frame_times = pd.date_range(start, end, freq=f'{int(frame_seconds)}s')
+    if history.empty or len(frame_times) == 0:
+        positions = pd.DataFrame(columns=['frame', 'aircraft_id', 'latitude', 'longitude', 'altitude', 'speed', 'heading'])
+        return Replay(start, end, frame_seconds, trails, positions)
+
+    # One as-of merge gives every aircraft's last position at every frame time
+    aircraft_ids = history['aircraft_id'].unique()
+    grid = pd.DataFrame({
+        'frame': np.repeat(np.arange(len(frame_times)), len(aircraft_ids)),
+        'recorded_at': np.repeat(frame_times.to_numpy(), len(aircraft_ids)),
+        'aircraft_id': np.tile(aircraft_ids, len(frame_times))
+    })
+    positions = pd.merge_asof(
+        grid.sort_values('recorded_at', kind='stable'),
+        history.sort_values('recorded_at', kind='stable'),
+        on='recorded_at',
+        by='aircraft_id',
+        direction='backward'
+    ).dropna(subset=['latitude'])
+    return Replay(start, end, frame_seconds, trails, positions.drop(columns='recorded_at'))
+
+@lru_cache(maxsize=4)
+def _load_history(window_end, window_seconds):
+    from database import Database
+
+    db = Database()
+    try:
+        return db.get_aircraft_history(window_end - timedelta(seconds=window_seconds), window_end)
+    finally:
+        db.close()
+
+@lru_cache(maxsize=16)
+def _cached_replay(window_end, window_seconds, zoom, frame_seconds, method):
+    history = _load_history(window_end, window_seconds)
+    history = history.assign(recorded_at=pd.to_datetime(history['recorded_at']))
+    start = window_end - timedelta(seconds=window_seconds)
+    return build_replay(history, start, window_end, zoom, frame_seconds, method)
+
+def get_replay(zoom, window_seconds=DEFAULT_WINDOW_SECONDS, frame_seconds=DEFAULT_FRAME_SECONDS,
+               method='douglas-peucker', now=None):
+    """Replay of the last window_seconds, shared by all sessions until the next frame boundary"""
+    now = now or datetime.now()
+    # Align the window to frame boundaries so every rerun within a frame hits the cache
+    epoch = int(now.timestamp()) // frame_seconds * frame_seconds
+    window_end = datetime.fromtimestamp(epoch)
+    return _cached_replay(window_end, window_seconds, zoom, frame_seconds, method)
+
+def build_replay_map(replay, index, zoom, trail_seconds=None):
+    import folium
+
+    m = folium.Map(location=[39.8283, -98.5795], zoom_start=zoom)
+    trails = replay.trails_until(index, trail_seconds)
+    for aircraft_id, trail in trails.groupby('aircraft_id', sort=False):
+        if len(trail) > 1:
+            folium.PolyLine(
+                trail[['latitude', 'longitude']].to_numpy().tolist(),
+                weight=2,
+                opacity=0.7,
+                tooltip=aircraft_id
+            ).add_to(m)
+    for _, aircraft in replay.frame(index).iterrows():
+        folium.CircleMarker(
+            [aircraft['latitude'], aircraft['longitude']],
+            radius=4,
+            color='red',
+            fill=True,
+            popup=f"Aircraft: {aircraft['aircraft_id']}"
+        ).add_to(m)
+    return m
+
+def render_replay_section():
+    import streamlit as st
+    from streamlit_folium import folium_static
+
+    st.subheader("Track Replay")
+    col1, col2 = st.columns(2)
+    with col1:
+        detail = st.selectbox("Map Detail", ["Region", "Area", "Local"], index=0)
+    with col2:
+        trail_minutes = st.selectbox("Trail Length", [5, 15, 60], index=1, format_func=lambda m: f"{m} min")
+    zoom = {"Region": 4, "Area": 6, "Local": 8}[detail]
+
+    replay = get_replay(zoom)
+    if replay.trails.empty:
+        st.info("No position history recorded in the last hour.")
+        return
+
+    index = st.slider("Replay Time", 0, len(replay) - 1, len(replay) - 1,
+                      format="frame %d")
+    st.caption(f"{replay.frame_times[index]:%H:%M:%S} - {len(replay.trails)} trail points after downsampling")
+    folium_static(build_replay_map(replay, index, zoom, trail_minutes * 60), width=800)